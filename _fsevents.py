@@ -0,0 +1,97 @@
+"""
+Native macOS FSEvents stream for the file watcher.
+
+watchdog's Observer unpacks every FSEvents callback into individual events
+and dispatches them one at a time from a Python thread. This module creates
+the FSEventStream directly (via pyobjc), schedules it on a GCD dispatch
+queue, and hands each coalesced callback to Python as a single batch.
+
+Requires pyobjc-framework-FSEvents and pyobjc-framework-libdispatch.
+AVAILABLE is False when they are missing or off macOS; file_watcher then
+falls back to watchdog.
+"""
+
+import os
+import sys
+from typing import Callable, List, Tuple
+
+try:
+    import FSEvents
+    import dispatch
+    AVAILABLE = sys.platform == 'darwin'
+except ImportError:
+    FSEvents = None
+    dispatch = None
+    AVAILABLE = False
+
+
+class FSEventStream:
+    """Recursive file-level FSEventStream for one directory.
+
+    on_batch is called on the dispatch queue's thread with a list of
+    (action, path) tuples, action being 'created', 'modified' or 'deleted'.
+    """
+
+    def __init__(self, root: str, on_batch: Callable[[List[Tuple[str, str]]], None],
+                 latency: float = 0.5):
+        self.root = root
+        self.on_batch = on_batch
+        self.latency = latency
+        self._stream = None
+        self._queue = None
+
+    def start(self):
+        if not AVAILABLE:
+            raise RuntimeError("pyobjc FSEvents bindings are not available")
+
+        removed_or_renamed = (FSEvents.kFSEventStreamEventFlagItemRemoved
+                              | FSEvents.kFSEventStreamEventFlagItemRenamed)
+        created = FSEvents.kFSEventStreamEventFlagItemCreated
+        is_file = FSEvents.kFSEventStreamEventFlagItemIsFile
+
+        def callback(stream_ref, info, num_events, paths, flags, event_ids):
+            events = []
+            for path, flag in zip(paths, flags):
+                if not flag & is_file:
+                    continue  # directories, MustScanSubDirs, HistoryDone, ...
+                path = str(path)
+                # Flags accumulate within the latency window, and a rename is
+                # reported on both the old and the new path, so existence
+                # decides between delete and create.
+                if flag & removed_or_renamed:
+                    action = 'created' if os.path.lexists(path) else 'deleted'
+                elif flag & created:
+                    action = 'created'
+                else:
+                    action = 'modified'
+                events.append((action, path))
+            if events:
+                self.on_batch(events)
+
+        self._queue = dispatch.dispatch_queue_create(b"code-rag.fsevents", None)
+        self._stream = FSEvents.FSEventStreamCreate(
+            None, callback, None, [self.root],
+            FSEvents.kFSEventStreamEventIdSinceNow, self.latency,
+            FSEvents.kFSEventStreamCreateFlagFileEvents
+            | FSEvents.kFSEventStreamCreateFlagNoDefer
+            | FSEvents.kFSEventStreamCreateFlagUseCFTypes,
+        )
+        if self._stream is None:
+            raise RuntimeError(f"FSEventStreamCreate failed for {self.root}")
+
+        FSEvents.FSEventStreamSetDispatchQueue(self._stream, self._queue)
+        if not FSEvents.FSEventStreamStart(self._stream):
+            self._release()
+            raise RuntimeError(f"FSEventStreamStart failed for {self.root}")
+
+    def stop(self):
+        if self._stream is None:
+            return
+        FSEvents.FSEventStreamStop(self._stream)
+        self._release()
+
+    def _release(self):
+        FSEvents.FSEventStreamInvalidate(self._stream)
+        FSEvents.FSEventStreamRelease(self._stream)
+        self._stream = None
+        self._queue = None
@@ -3,53 +3,370 @@ AST-based code chunking using tree-sitter (trusted, mature library).
 Extracts semantic units (classes, methods, functions) respecting syntax boundaries.
 """
 
-from tree_sitter import Language, Parser
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from tree_sitter import Language, Parser, Query, QueryCursor, Tree
 import tree_sitter_java
 import tree_sitter_python
 import tree_sitter_typescript
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 
+logger = logging.getLogger("code-rag.ast")
+
+
+# Parser instances, cached per thread: a tree-sitter Parser must not be used
+# from two threads at once (index_directory and the watcher chunk files on
+# several threads). Language and compiled Query objects are immutable and
+# shared.
+_parsers = threading.local()
+_languages: Dict[str, Language] = {}
+_languages_lock = threading.Lock()
+
+# Node types to extract as chunks (from code-chunk best practices)
+_CHUNK_TYPES = {
+    'java': frozenset(['method_declaration', 'class_declaration', 'interface_declaration',
+                       'enum_declaration']),
+    'python': frozenset(['function_definition', 'class_definition']),
+    'typescript': frozenset(['function_declaration', 'method_definition', 'class_declaration',
+                             'interface_declaration', 'type_alias_declaration', 'enum_declaration']),
+    'javascript': frozenset(['function_declaration', 'method_definition', 'class_declaration']),
+}
+
+# Compiled chunk queries (cached alongside parsers, keyed by language)
+_queries: Dict[str, Query] = {}
+
+# _CHUNK_TYPES resolved to tree-sitter symbol ids, keyed by language.
+# node.type builds a fresh (un-interned) str on every access, so a string set
+# lookup pays a hash plus compare per node; node.kind_id is a small int.
+_chunk_kind_ids: Dict[str, frozenset] = {}
+
+# Last parse per path: (language, source_bytes, tree). Lets re-chunking an
+# edited file hand the old tree to tree-sitter so only the changed region is
+# re-parsed. Bounded LRU — only recently edited files benefit.
+_MAX_TREES = int(os.getenv("CODE_RAG_AST_TREE_CACHE_SIZE", "128"))
+_trees: "OrderedDict[str, Tuple[str, bytes, Tree]]" = OrderedDict()
+_trees_lock = threading.Lock()
+
+
+# --- Chunk cache ---
+#
+# Chunking is a pure function of (content, language, max_size), so unchanged
+# files never need to be re-parsed. Results are memoized in-process (LRU) and
+# persisted to SQLite so warm re-indexing from the CLI or a restarted server
+# also skips tree-sitter. Keys are blake2b digests of the source bytes.
+
+_CACHE_SIZE = int(os.getenv("CODE_RAG_AST_CACHE_SIZE", "4096"))
+_CACHE_DB_PATH = os.getenv("CODE_RAG_AST_CACHE_DB",
+                           str(Path.home() / ".code-rag" / "ast_cache.db"))
+# Persistent rows unused for this long, or beyond the _CACHE_MAX_ROWS most
+# recently used, are pruned when a process first opens the cache and every
+# _CACHE_PRUNE_EVERY writes after that (rows for deleted/moved files and
+# other projects)
+_CACHE_MAX_AGE_DAYS = int(os.getenv("CODE_RAG_AST_CACHE_MAX_AGE_DAYS", "30"))
+_CACHE_MAX_ROWS = int(os.getenv("CODE_RAG_AST_CACHE_MAX_ROWS", "200000"))
+_CACHE_PRUNE_EVERY = 1000
+# Cache hits refresh their row's used time in batches of this many, so the
+# prune is LRU without a write per hit (touches pending at exit are lost)
+_CACHE_TOUCH_BATCH = 256
+
+_MISS = object()
+# In-process LRU; _cache_lock guards only this dict, never SQLite or JSON work
+_chunk_cache: "OrderedDict[bytes, Optional[List[Dict]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+# One SQLite connection per thread, so concurrent chunking doesn't serialize
+# on a shared one; WAL lets readers proceed while one thread writes
+_cache_local = threading.local()
+_cache_conn_failed = False
+_cache_schema_ready = False
+_cache_schema_lock = threading.Lock()
+_cache_writes = 0
+_cache_touched: set = set()
+
+
+def _cache_key(source_bytes: bytes, language: str, max_size: int) -> bytes:
+    """Digest identifying a chunking result (content + chunking parameters)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{language}\0{max_size}\0".encode('utf-8'))
+    h.update(source_bytes)
+    return h.digest()
+
+
+def _get_cache_connection() -> Optional[sqlite3.Connection]:
+    """Open this thread's connection to the persistent chunk cache.
+
+    Returns None if disabled or unavailable.
+    """
+    global _cache_conn_failed, _cache_schema_ready
+    conn = getattr(_cache_local, 'conn', None)
+    if conn is not None or _cache_conn_failed or not _CACHE_DB_PATH:
+        return conn
+    try:
+        Path(_CACHE_DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(_CACHE_DB_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # A cache: losing the last few commits on power loss is fine, and
+        # NORMAL skips the fsync on every per-file commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _cache_schema_lock:
+            if not _cache_schema_ready:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS chunk_cache (
+                        path TEXT NOT NULL,
+                        hash BLOB NOT NULL,
+                        json BLOB NOT NULL,
+                        used REAL NOT NULL,
+                        PRIMARY KEY (path, hash)
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS chunk_cache_used ON chunk_cache (used)")
+                conn.commit()
+                _cache_prune(conn)
+                _cache_schema_ready = True
+    except Exception as e:
+        _cache_conn_failed = True
+        logger.warning("AST chunk cache unavailable (%s): %s", _CACHE_DB_PATH, e)
+        return None
+    _cache_local.conn = conn
+    return conn
+
+
+def _cache_prune(conn: sqlite3.Connection):
+    """Drop rows unused for _CACHE_MAX_AGE_DAYS, then all but the
+    _CACHE_MAX_ROWS most recently used."""
+    _cache_flush_touched(conn)
+    try:
+        with conn:
+            conn.execute("DELETE FROM chunk_cache WHERE used < ?",
+                         (time.time() - _CACHE_MAX_AGE_DAYS * 86400,))
+            conn.execute("""
+                DELETE FROM chunk_cache WHERE used < (
+                    SELECT used FROM chunk_cache ORDER BY used DESC LIMIT 1 OFFSET ?
+                )
+            """, (_CACHE_MAX_ROWS,))
+    except sqlite3.Error as e:
+        logger.warning("AST chunk cache prune failed (non-fatal): %s", e)
+
+
+def _cache_touch(path: str, key: bytes):
+    """Note a cache hit; flushes the batch once _CACHE_TOUCH_BATCH have built up."""
+    with _cache_lock:
+        _cache_touched.add((path, key))
+        if len(_cache_touched) < _CACHE_TOUCH_BATCH:
+            return
+    conn = _get_cache_connection()
+    if conn is not None:
+        _cache_flush_touched(conn)
+
+
+def _cache_flush_touched(conn: sqlite3.Connection):
+    """Write pending hits' used time in one transaction."""
+    global _cache_touched
+    with _cache_lock:
+        touched, _cache_touched = _cache_touched, set()
+    if not touched:
+        return
+    now = time.time()
+    try:
+        with conn:
+            conn.executemany("UPDATE chunk_cache SET used = ? WHERE path = ? AND hash = ?",
+                             [(now, path, key) for path, key in touched])
+    except sqlite3.Error as e:
+        logger.warning("AST chunk cache touch failed (non-fatal): %s", e)
+
+
+def _cache_get(path: str, key: bytes):
+    """Look up cached chunks. Returns _MISS when not cached."""
+    with _cache_lock:
+        chunks = _chunk_cache.get(key, _MISS)
+        if chunks is not _MISS:
+            _chunk_cache.move_to_end(key)
+    if chunks is not _MISS:
+        _cache_touch(path, key)
+        return chunks
+
+    conn = _get_cache_connection()
+    if conn is None:
+        return _MISS
+    try:
+        row = conn.execute(
+            "SELECT json FROM chunk_cache WHERE path = ? AND hash = ?", (path, key)
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("AST chunk cache read failed (non-fatal): %s", e)
+        return _MISS
+    if row is None:
+        return _MISS
+    chunks = json.loads(row[0])
+    with _cache_lock:
+        _cache_remember(key, chunks)
+    _cache_touch(path, key)
+    return chunks
 
-# Parser instances (cached)
-_parsers = {}
+
+def _cache_put(path: str, key: bytes, chunks: Optional[List[Dict]]):
+    """Store chunks for (path, key), dropping rows for older versions of path."""
+    global _cache_writes
+    with _cache_lock:
+        _cache_remember(key, chunks)
+        _cache_writes += 1
+        prune = _cache_writes % _CACHE_PRUNE_EVERY == 0
+
+    conn = _get_cache_connection()
+    if conn is None:
+        return
+    blob = json.dumps(chunks).encode('utf-8')
+    try:
+        with conn:
+            conn.execute("DELETE FROM chunk_cache WHERE path = ? AND hash != ?", (path, key))
+            conn.execute(
+                "INSERT OR REPLACE INTO chunk_cache (path, hash, json, used) VALUES (?, ?, ?, ?)",
+                (path, key, blob, time.time())
+            )
+    except sqlite3.Error as e:
+        logger.warning("AST chunk cache write failed (non-fatal): %s", e)
+    if prune:
+        _cache_prune(conn)
+
+
+def _cache_remember(key: bytes, chunks: Optional[List[Dict]]):
+    """Insert into the in-process LRU, evicting the oldest entry when full.
+    Caller holds _cache_lock."""
+    _chunk_cache[key] = chunks
+    _chunk_cache.move_to_end(key)
+    while len(_chunk_cache) > _CACHE_SIZE:
+        _chunk_cache.popitem(last=False)
+
+
+def _copy_chunks(chunks: Optional[List[Dict]]) -> Optional[List[Dict]]:
+    """Shallow-copy each chunk — callers add metadata in place."""
+    if chunks is None:
+        return None
+    return [dict(c) for c in chunks]
+
+
+def _get_language(language: str) -> Optional[Language]:
+    """Get or create the shared Language (and its chunk query) for language."""
+    if language in _languages:
+        return _languages[language]
+
+    with _languages_lock:
+        if language in _languages:
+            return _languages[language]
+
+        # Create Language object (with correct function names)
+        if language == 'java':
+            lang = Language(tree_sitter_java.language())
+        elif language == 'python':
+            lang = Language(tree_sitter_python.language())
+        elif language in ['typescript', 'javascript']:
+            lang = Language(tree_sitter_typescript.language_typescript())
+        elif language == 'tsx':
+            lang = Language(tree_sitter_typescript.language_tsx())
+        else:
+            return None
+
+        # Compile the chunk-type filter once so matching runs in tree-sitter's C
+        # query engine instead of visiting every node from Python.
+        chunk_types = _CHUNK_TYPES.get(language)
+        if chunk_types:
+            pattern = ' '.join(f'({t})' for t in sorted(chunk_types))
+            _queries[language] = Query(lang, f'[{pattern}] @chunk')
+            # All symbols with a matching name, not just id_for_node_kind's
+            # first hit — aliased nodes can share a name across several ids.
+            _chunk_kind_ids[language] = frozenset(
+                i for i in range(lang.node_kind_count)
+                if lang.node_kind_is_named(i) and lang.node_kind_for_id(i) in chunk_types
+            )
+
+        _languages[language] = lang
+    return lang
 
 
 def get_parser(language: str) -> Parser:
-    """Get or create parser for language."""
-    if language in _parsers:
-        return _parsers[language]
-
-    # Create Language object (with correct function names)
-    if language == 'java':
-        lang = Language(tree_sitter_java.language())
-    elif language == 'python':
-        lang = Language(tree_sitter_python.language())
-    elif language in ['typescript', 'javascript']:
-        lang = Language(tree_sitter_typescript.language_typescript())
-    elif language == 'tsx':
-        lang = Language(tree_sitter_typescript.language_tsx())
-    else:
+    """Get or create this thread's parser for language."""
+    parsers = getattr(_parsers, 'by_language', None)
+    if parsers is None:
+        parsers = _parsers.by_language = {}
+    if language in parsers:
+        return parsers[language]
+
+    lang = _get_language(language)
+    if lang is None:
         return None
 
     # Create parser with language (pass to constructor)
     parser = Parser(lang)
 
-    _parsers[language] = parser
+    parsers[language] = parser
     return parser
 
 
-def extract_node_text(source_bytes: bytes, node) -> str:
-    """Extract text for a tree-sitter node."""
-    return source_bytes[node.start_byte:node.end_byte].decode('utf-8')
+def extract_node_text(source_bytes, node) -> str:
+    """Extract text for a tree-sitter node. Accepts bytes or a memoryview."""
+    return str(source_bytes[node.start_byte:node.end_byte], 'utf-8')
 
 
-def get_line_number(source_bytes: bytes, byte_offset: int) -> int:
-    """Convert byte offset to line number."""
-    return source_bytes[:byte_offset].count(b'\n') + 1
+class ChunkArray:
+    """Columnar (struct-of-arrays) chunk list over a single source buffer.
 
+    Stores node spans and line ranges in flat integer arrays instead of one
+    dict per chunk; text is only decoded when a chunk is materialized.
+    """
 
-def chunk_with_ast(content: str, language: str, path: str, max_size: int = None) -> List[Dict]:
+    __slots__ = ('source', 'start_lines', 'end_lines', 'start_bytes', 'end_bytes', 'node_types')
+
+    def __init__(self, source: bytes):
+        self.source = memoryview(source)
+        self.start_lines = array('l')
+        self.end_lines = array('l')
+        self.start_bytes = array('l')
+        self.end_bytes = array('l')
+        self.node_types: List[str] = []
+
+    def append(self, node):
+        """Record a tree-sitter node as a chunk."""
+        # Tree-sitter already tracked rows while parsing (0-based)
+        self.start_lines.append(node.start_point[0] + 1)
+        self.end_lines.append(node.end_point[0] + 1)
+        self.start_bytes.append(node.start_byte)
+        self.end_bytes.append(node.end_byte)
+        self.node_types.append(node.type)
+
+    def extend(self, nodes: List) -> None:
+        """Record several tree-sitter nodes, filling each column in one pass."""
+        self.start_lines.extend([n.start_point[0] + 1 for n in nodes])
+        self.end_lines.extend([n.end_point[0] + 1 for n in nodes])
+        self.start_bytes.extend([n.start_byte for n in nodes])
+        self.end_bytes.extend([n.end_byte for n in nodes])
+        self.node_types.extend([n.type for n in nodes])
+
+    def __len__(self) -> int:
+        return len(self.node_types)
+
+    def __getitem__(self, i: int) -> Dict:
+        return {
+            'content': str(self.source[self.start_bytes[i]:self.end_bytes[i]], 'utf-8'),
+            'start_line': self.start_lines[i],
+            'end_line': self.end_lines[i],
+            'node_type': self.node_types[i],
+        }
+
+    def to_dicts(self) -> List[Dict]:
+        """Materialize as the List[Dict] format the rest of the pipeline uses."""
+        return [self[i] for i in range(len(self))]
+
+
+def chunk_with_ast(content: str, language: str, path: str, max_size: int = None,
+                   source_bytes: bytes = None) -> List[Dict]:
     """
     Chunk code using AST parsing to respect semantic boundaries.
 
@@ -58,83 +375,172 @@ def chunk_with_ast(content: str, language: str, path: str, max_size: int = None)
         language: Language (java, python, typescript, javascript)
         path: File path
         max_size: Maximum chunk size in characters
+        source_bytes: content.encode('utf-8'), if the caller already has it
 
     Returns:
         List of chunks with AST-aware boundaries
     """
     if max_size is None:
-        import os
         max_size = int(os.getenv("MAX_CHUNK_SIZE", "3000"))
 
+    return _chunk_cached(content, language, path, max_size,
+                         lambda parser, sb: parser.parse(sb), source_bytes)
+
+
+def chunk_with_ast_incremental(content: str, language: str, path: str,
+                               edit: Optional[Tuple] = None, max_size: int = None,
+                               source_bytes: bytes = None) -> List[Dict]:
+    """
+    Like chunk_with_ast, but re-uses the previous parse tree for path.
+
+    Args:
+        content: New source code content
+        language: Language (java, python, typescript, javascript)
+        path: File path (keys the retained tree)
+        edit: Optional (start_byte, old_end_byte, new_end_byte,
+              start_point, old_end_point, new_end_point) describing the change
+              since the last call. Derived from the previous source when omitted.
+        max_size: Maximum chunk size in characters
+        source_bytes: content.encode('utf-8'), if the caller already has it
+
+    Returns:
+        List of chunks with AST-aware boundaries
+    """
+    if max_size is None:
+        max_size = int(os.getenv("MAX_CHUNK_SIZE", "3000"))
+
+    def parse(parser: Parser, source_bytes: bytes) -> Tree:
+        return _parse_incremental(parser, language, path, source_bytes, edit)
+
+    return _chunk_cached(content, language, path, max_size, parse, source_bytes)
+
+
+def _chunk_cached(content: str, language: str, path: str, max_size: int, parse,
+                  source_bytes: bytes = None) -> Optional[List[Dict]]:
+    """Shared cache lookup + parse + extract for the chunk_with_ast entry points."""
     parser = get_parser(language)
     if not parser:
         return None  # Fall back to regex chunking
 
-    source_bytes = content.encode('utf-8')
-    tree = parser.parse(source_bytes)
-    root = node = tree.root_node
-
-    chunks = []
-
-    # Node types to extract as chunks (from code-chunk best practices)
-    if language == 'java':
-        chunk_types = ['method_declaration', 'class_declaration', 'interface_declaration', 'enum_declaration']
-    elif language == 'python':
-        chunk_types = ['function_definition', 'class_definition']
-    elif language == 'typescript':
-        chunk_types = ['function_declaration', 'method_definition', 'class_declaration',
-                      'interface_declaration', 'type_alias_declaration', 'enum_declaration']
-    elif language == 'javascript':
-        chunk_types = ['function_declaration', 'method_definition', 'class_declaration']
-    else:
-        chunk_types = []
-
-    # Use iterative traversal (not recursive) to avoid stack overflow on deeply nested code
-    stack = [root]
-
-    while stack:
-        node = stack.pop()
-
-        # Check if this node is a chunkable type
-        if node.type in chunk_types:
-            text = extract_node_text(source_bytes, node)
-
-            # Only chunk if reasonable size
-            if len(text) >= 50:  # Minimum chunk size
-                start_line = get_line_number(source_bytes, node.start_byte)
-                end_line = get_line_number(source_bytes, node.end_byte)
-
-                chunk = {
-                    'content': text,
-                    'start_line': start_line,
-                    'end_line': end_line,
-                    'node_type': node.type
-                }
-
-                # If chunk is too large, try to split by child nodes
-                if len(text) > max_size:
-                    # For large classes, extract methods individually
-                    child_chunks = []
-                    for child in node.children:
-                        if child.type in chunk_types:
-                            child_text = extract_node_text(source_bytes, child)
-                            if len(child_text) >= 50:
-                                child_chunks.append({
-                                    'content': child_text,
-                                    'start_line': get_line_number(source_bytes, child.start_byte),
-                                    'end_line': get_line_number(source_bytes, child.end_byte),
-                                    'node_type': child.type
-                                })
-
-                    if child_chunks:
-                        chunks.extend(child_chunks)
-                    else:
-                        chunks.append(chunk)  # Keep large chunk if no children
-                else:
-                    chunks.append(chunk)
-
-        # Add children to stack for traversal
-        stack.extend(reversed(node.children))
+    if source_bytes is None:
+        source_bytes = content.encode('utf-8')
+
+    # Unchanged content: skip parsing entirely
+    key = _cache_key(source_bytes, language, max_size)
+    cached = _cache_get(path, key)
+    if cached is not _MISS:
+        return _copy_chunks(cached)
+
+    tree = parse(parser, source_bytes)
+    chunk_array = _extract_chunks(tree, source_bytes, language, max_size)
+    chunks = chunk_array.to_dicts() if chunk_array is not None else None
+    _cache_put(path, key, chunks)
+    return _copy_chunks(chunks)
+
+
+def _point_at(source_bytes: bytes, offset: int) -> Tuple[int, int]:
+    """(row, byte column) of a byte offset, as tree-sitter expects."""
+    row = source_bytes.count(b'\n', 0, offset)
+    col = offset - (source_bytes.rfind(b'\n', 0, offset) + 1)
+    return row, col
+
+
+# Block size for _common_prefix_len's scan: large enough that each probe is
+# one memcmp, small enough that the block holding the difference is cheap to
+# bisect.
+_DIFF_BLOCK = 4096
+
+
+def _common_prefix_len(old: bytes, new: bytes) -> int:
+    """Length of the common prefix of old and new.
+
+    Walks forward a block at a time, then bisects the block that differs.
+    Each probe is a memcmp over a slice of at most _DIFF_BLOCK bytes, so
+    the bytes copied stay proportional to the prefix instead of the
+    O(n log n) that bisecting whole-prefix slices costs.
+    """
+    limit = min(len(old), len(new))
+    start = 0
+    while start + _DIFF_BLOCK <= limit and old[start:start + _DIFF_BLOCK] == new[start:start + _DIFF_BLOCK]:
+        start += _DIFF_BLOCK
+
+    lo, hi = start, min(start + _DIFF_BLOCK, limit)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[start:mid] == new[start:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _diff_edit(old: bytes, new: bytes) -> Tuple:
+    """Single edit spanning everything between the common prefix and suffix."""
+    prefix = _common_prefix_len(old, new)
+    # Common suffix, not overlapping the prefix: the prefix of the reversed
+    # remainders (one copy each, reversed in C)
+    suffix = _common_prefix_len(old[prefix:][::-1], new[prefix:][::-1])
+
+    old_end = len(old) - suffix
+    new_end = len(new) - suffix
+    return (prefix, old_end, new_end,
+            _point_at(old, prefix), _point_at(old, old_end), _point_at(new, new_end))
+
+
+def _parse_incremental(parser: Parser, language: str, path: str,
+                       source_bytes: bytes, edit: Optional[Tuple] = None) -> Tree:
+    """Parse source_bytes, seeding tree-sitter with the last tree for path if any."""
+    with _trees_lock:
+        previous = _trees.pop(path, None)
+
+    old_tree = None
+    if previous is not None and previous[0] == language:
+        _, old_bytes, old_tree = previous
+        old_tree.edit(*(edit or _diff_edit(old_bytes, source_bytes)))
+
+    tree = parser.parse(source_bytes, old_tree) if old_tree is not None else parser.parse(source_bytes)
+
+    with _trees_lock:
+        _trees[path] = (language, source_bytes, tree)
+        while len(_trees) > _MAX_TREES:
+            _trees.popitem(last=False)
+    return tree
+
+
+def _extract_chunks(tree: Tree, source_bytes: bytes, language: str, max_size: int) -> Optional[ChunkArray]:
+    """Extract chunkable nodes from a parsed tree (uncached)."""
+    chunks = ChunkArray(source_bytes)
+
+    query = _queries.get(language)
+    if query is None:
+        return None
+    chunk_kind_ids = _chunk_kind_ids[language]
+
+    # Captures come back grouped by name; restore document pre-order
+    # (outer node before the nodes nested inside it).
+    matches = QueryCursor(query).captures(tree.root_node).get('chunk', [])
+    matches.sort(key=lambda n: (n.start_byte, -n.end_byte))
+
+    for node in matches:
+        # Gate on byte length (free from the node); text is decoded only
+        # when the chunk is materialized.
+        size = node.end_byte - node.start_byte
+
+        # Only chunk if reasonable size
+        if size >= 50:  # Minimum chunk size
+            # If chunk is too large, try to split by child nodes
+            child_chunks = None
+            if size > max_size:
+                # For large classes, extract methods individually
+                child_chunks = [
+                    child for child in node.children
+                    if child.kind_id in chunk_kind_ids and child.end_byte - child.start_byte >= 50
+                ]
+
+            if child_chunks:
+                chunks.extend(child_chunks)
+            else:
+                chunks.append(node)  # Keep large chunk if no children
 
     # If no chunks found, return None to fall back to regex
     if not chunks:
@@ -143,7 +549,7 @@ def chunk_with_ast(content: str, language: str, path: str, max_size: int = None)
     return chunks
 
 
-def chunk_code_ast(content: str, language: str, path: str) -> List[Dict]:
+def chunk_code_ast(content: str, language: str, path: str, source_bytes: bytes = None) -> List[Dict]:
     """
     Chunk code using AST if possible, fall back to regex if not.
 
@@ -154,8 +560,8 @@ def chunk_code_ast(content: str, language: str, path: str) -> List[Dict]:
         return None  # AST not available for this language
 
     try:
-        chunks = chunk_with_ast(content, language, path)
+        chunks = chunk_with_ast_incremental(content, language, path, source_bytes=source_bytes)
         return chunks
     except Exception as e:
-        print(f"AST chunking failed for {path}: {e}")
+        logger.debug("AST chunking failed for %s: %s", path, e)
         return None  # Fall back to regex
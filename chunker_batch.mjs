@@ -2,13 +2,17 @@
 /**
  * Batch Node.js chunker using NDJSON streaming.
  *
- * Reads NDJSON from stdin: {"filepath": "...", "content": "...", "max_size": 2000}
- * Writes NDJSON to stdout: {"filepath": "...", "chunks": [...]} or {"filepath": "...", "error": "..."}
+ * Reads NDJSON from stdin: {"id": 1, "filepath": "...", "content": "...", "max_size": 2000}
+ * Writes NDJSON to stdout: {"id": 1, "filepath": "...", "chunks": [...]} or {"id": 1, "filepath": "...", "error": "..."}
  *
  * Single process handles all files — no cold-start overhead per file.
+ * The optional request id is echoed back so callers can match replies.
+ * Large files may send "content_path" (a file or /proc/<pid>/fd/<n> path to
+ * read the source from) instead of inline "content".
  */
 
 import { chunk } from 'code-chunk';
+import { readFileSync } from 'fs';
 import { createInterface } from 'readline';
 
 const rl = createInterface({ input: process.stdin });
@@ -20,14 +24,15 @@ for await (const line of rl) {
     try {
         req = JSON.parse(line);
     } catch (e) {
-        console.log(JSON.stringify({ filepath: null, error: `Invalid JSON: ${e.message}` }));
+        console.log(JSON.stringify({ id: null, filepath: null, error: `Invalid JSON: ${e.message}` }));
         continue;
     }
 
     const defaultMaxSize = parseInt(process.env.MAX_CHUNK_SIZE || '3000');
-    const { filepath, content, max_size = defaultMaxSize } = req;
+    const { id = null, filepath, content_path, max_size = defaultMaxSize } = req;
 
     try {
+        const content = req.content ?? readFileSync(content_path, 'utf8');
         const chunks = await chunk(filepath, content, {
             maxChunkSize: max_size,
             contextMode: 'full',
@@ -45,8 +50,8 @@ for await (const line of rl) {
             signatures: c.context.entities.filter(e => e.signature).map(e => e.signature),
         }));
 
-        console.log(JSON.stringify({ filepath, chunks: output }));
+        console.log(JSON.stringify({ id, filepath, chunks: output }));
     } catch (error) {
-        console.log(JSON.stringify({ filepath, error: error.message }));
+        console.log(JSON.stringify({ id, filepath, error: error.message }));
     }
 }
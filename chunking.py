@@ -3,22 +3,27 @@ Code chunking utilities - AST-based when possible, regex fallback.
 Uses tree-sitter for semantic chunking of Java, Python, TypeScript, JavaScript.
 """
 
+import logging
+import operator
 import os
 import re
+from itertools import accumulate, repeat
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from dotenv import load_dotenv
 import yaml
 
+logger = logging.getLogger("code-rag.chunking")
+
 # Try to import code-chunk wrapper (best quality - has context features)
 try:
     from codechunk_wrapper import chunk_with_codechunk
     CODECHUNK_AVAILABLE = True
-    print("[DEBUG] code-chunk available")
+    logger.info("code-chunk available")
 except ImportError as e:
     CODECHUNK_AVAILABLE = False
     chunk_with_codechunk = None
-    print(f"[DEBUG] code-chunk not available: {e}")
+    logger.info("code-chunk not available: %s", e)
 
 # Fallback: tree-sitter AST chunking
 try:
@@ -35,6 +40,17 @@ load_dotenv()
 MAX_CHUNK_SIZE = int(os.getenv("MAX_CHUNK_SIZE", "3000"))
 MIN_CHUNK_SIZE = int(os.getenv("MIN_CHUNK_SIZE", "50"))
 
+# Regex-fallback patterns (compiled once, not per file). They are searched
+# within one line's [start, end) span of the whole file, so '^' needs MULTILINE
+# to match at a line start that is not offset 0.
+# Java class/interface/enum declarations
+_JAVA_CLASS_RE = re.compile(r'^\s*(public|private|protected)?\s*(static\s+)?(class|interface|enum)\s+(\w+)', re.MULTILINE)
+# Ext.define, Ext.create, Ext.application, Ext.override
+_EXT_DEFINE_RE = re.compile(r"Ext\.(define|create|application|override)\s*\(\s*['\"]?([\w.]+)")
+# TypeScript interface/type/class/enum declarations
+_TS_DECL_RE = re.compile(r'^\s*(export\s+)?(interface|type|class|enum)\s+(\w+)', re.MULTILINE)
+_NEWLINE_RE = re.compile('\n')
+
 
 def detect_language(path: str) -> str:
     """Detect language from file extension."""
@@ -71,10 +87,12 @@ def detect_type(path: str, language: str) -> str:
         return 'code'
 
 
-def _add_metadata(chunks: List[Dict], path: str) -> List[Dict]:
-    """Add standard metadata fields to chunks."""
-    lang = detect_language(path)
-    file_type = detect_type(path, lang)
+def _add_metadata(chunks: List[Dict], path: str, lang: str = None, file_type: str = None) -> List[Dict]:
+    """Add standard metadata fields to chunks. Pass lang/file_type if already known."""
+    if lang is None:
+        lang = detect_language(path)
+    if file_type is None:
+        file_type = detect_type(path, lang)
 
     for chunk in chunks:
         chunk['path'] = path
@@ -135,179 +153,169 @@ def chunk_default(content: str, path: str) -> List[Dict]:
             'end_line': content.count('\n') + 1
         }]
 
-    # Large files - split by size
-    lines = content.split('\n')
-    current_chunk = []
+    # Large files - split by size (line lengths only, newlines not counted)
+    starts, ends = _line_offsets(content)
+    n_lines = len(starts)
+    chunk_start = 0
     current_size = 0
-    start_line = 1
 
-    for i, line in enumerate(lines, 1):
-        current_chunk.append(line)
-        current_size += len(line)
+    for i in range(n_lines):
+        current_size += ends[i] - starts[i]
 
         if current_size >= MAX_CHUNK_SIZE:
-            chunk_content = '\n'.join(current_chunk)
             chunks.append({
-                'content': chunk_content,
+                'content': content[starts[chunk_start]:ends[i]],
                 'path': path,
                 'language': lang,
                 'type': file_type,
-                'start_line': start_line,
-                'end_line': i
+                'start_line': chunk_start + 1,
+                'end_line': i + 1
             })
-            current_chunk = []
             current_size = 0
-            start_line = i + 1
+            chunk_start = i + 1
 
     # Add remaining
-    if current_chunk:
-        chunk_content = '\n'.join(current_chunk)
+    if chunk_start < n_lines:
+        chunk_content = content[starts[chunk_start]:]
         if len(chunk_content) >= MIN_CHUNK_SIZE:
             chunks.append({
                 'content': chunk_content,
                 'path': path,
                 'language': lang,
                 'type': file_type,
-                'start_line': start_line,
-                'end_line': len(lines)
+                'start_line': chunk_start + 1,
+                'end_line': n_lines
             })
 
     return chunks
 
 
 def chunk_file(path: str) -> List[Dict]:
-    """Chunk a file using AST when possible, regex fallback."""
+    """Chunk a file using AST when possible, regex fallback.
+
+    Every chunker path sets path/language/type exactly once.
+    """
     try:
         with open(path, 'r', encoding='utf-8') as f:
             content = f.read()
     except Exception as e:
-        print(f"Error reading {path}: {e}")
+        logger.warning("Error reading %s: %s", path, e)
         return []
 
     lang = detect_language(path)
+    file_type = detect_type(path, lang)
+    chunks = None
+
+    # Encode once; code-chunk (large files go through a content file) and the
+    # tree-sitter fallback both need the UTF-8 bytes
+    source_bytes = None
+    if lang in ['java', 'python', 'typescript', 'javascript', 'rust', 'go'] and (CODECHUNK_AVAILABLE or AST_AVAILABLE):
+        source_bytes = content.encode('utf-8')
 
     # Try code-chunk first (best - has full context: scope, imports, signatures)
     if CODECHUNK_AVAILABLE and lang in ['java', 'python', 'typescript', 'javascript', 'rust', 'go']:
-        chunks = chunk_with_codechunk(content, path, lang)
-        if chunks:
-            # code-chunk succeeded - use contextualized chunks
-            pass  # chunks already set
-        # code-chunk failed, try tree-sitter AST
-        elif AST_AVAILABLE:
-            ast_chunks = chunk_code_ast(content, lang, path)
-            if ast_chunks:
-                chunks = ast_chunks
-            else:
-                # Both failed, use regex
-                if lang == 'java':
-                    chunks = chunk_java(content, path)
-                elif lang == 'javascript':
-                    chunks = chunk_javascript(content, path)
-                elif lang == 'typescript':
-                    chunks = chunk_typescript(content, path)
-                else:
-                    chunks = chunk_default(content, path)
-        else:
-            # code-chunk failed, no AST available, use regex
-            if lang == 'java':
-                chunks = chunk_java(content, path)
-            elif lang == 'javascript':
-                chunks = chunk_javascript(content, path)
-            elif lang == 'typescript':
-                chunks = chunk_typescript(content, path)
-            else:
-                chunks = chunk_default(content, path)
-    # Try AST-based chunking if code-chunk not available
-    elif AST_AVAILABLE and lang in ['java', 'python', 'typescript', 'javascript']:
-        ast_chunks = chunk_code_ast(content, lang, path)
-        if ast_chunks:
-            chunks = ast_chunks
-        else:
-            # AST failed, fall back to regex
-            if lang == 'java':
-                chunks = chunk_java(content, path)
-            elif lang == 'javascript':
-                chunks = chunk_javascript(content, path)
-            elif lang == 'typescript':
-                chunks = chunk_typescript(content, path)
-            else:
-                chunks = chunk_default(content, path)
-    # For other languages, use language-specific chunker
+        chunks = chunk_with_codechunk(content, path, lang, source_bytes=source_bytes)
+
+    # code-chunk unavailable or failed, try tree-sitter AST
+    if not chunks and AST_AVAILABLE and lang in ['java', 'python', 'typescript', 'javascript']:
+        chunks = chunk_code_ast(content, lang, path, source_bytes=source_bytes)
+
+    if chunks:
+        # code-chunk / tree-sitter chunks carry no file metadata yet
+        return _add_metadata(chunks, path, lang, file_type)
+
+    # Both failed (or not applicable), use language-specific regex chunker
+    if lang == 'java':
+        return chunk_java(content, path)
+    elif lang == 'javascript':
+        return chunk_javascript(content, path)
+    elif lang == 'typescript':
+        return chunk_typescript(content, path)
     elif lang == 'yaml':
-        chunks = chunk_yaml(content, path)
+        return chunk_yaml(content, path)
     else:
-        chunks = chunk_default(content, path)
+        return chunk_default(content, path)
+
+
+def _line_offsets(content: str) -> Tuple[List[int], List[int]]:
+    """Start offset and end offset (exclusive, newline not included) of every line.
+
+    Lines [a, b] of content are content[starts[a]:ends[b]] — the same text as
+    '\\n'.join(content.split('\\n')[a:b + 1]) without materializing each line.
+    """
+    ends = [m.start() for m in _NEWLINE_RE.finditer(content)]
+    starts = [0]
+    starts.extend(e + 1 for e in ends)
+    ends.append(len(content))
+    return starts, ends
+
+
+def _line_depths(content: str, starts: List[int], ends: List[int], open_ch: str, close_ch: str) -> List[int]:
+    """Running (open - close) count at the end of each line.
+
+    Computed for the whole file in one pass of C-level iterators
+    (map/accumulate) instead of per-line Python arithmetic in the chunk loop.
+    There is no Python-level inner loop left here for numba/Cython to
+    compile — the character scan is str.count, already native.
+    """
+    opens = map(content.count, repeat(open_ch), starts, ends)
+    closes = map(content.count, repeat(close_ch), starts, ends)
+    return list(accumulate(map(operator.sub, opens, closes)))
 
-    # Ensure all chunks have metadata (some chunkers already add it)
-    for chunk in chunks:
-        if 'path' not in chunk:
-            chunk['path'] = path
-        if 'language' not in chunk:
-            chunk['language'] = lang
-        if 'type' not in chunk:
-            chunk['type'] = detect_type(path, lang)
 
-    return chunks
 def chunk_java(content: str, path: str) -> List[Dict]:
     """Chunk Java code by class and method boundaries."""
     chunks = []
-    lines = content.split('\n')
-
-    # Pattern for class/interface/enum declarations
-    class_pattern = re.compile(r'^\s*(public|private|protected)?\s*(static\s+)?(class|interface|enum)\s+(\w+)')
-    # Pattern for method declarations
-    method_pattern = re.compile(r'^\s*(public|private|protected)\s+(static\s+)?[\w<>,\s]+\s+(\w+)\s*\(')
+    starts, ends = _line_offsets(content)
+    n_lines = len(starts)
 
-    current_chunk = []
+    # The current chunk is always lines [chunk_start, i]; it is empty while
+    # chunk_start > i, and its text is a single slice of content
     chunk_start = 0
     current_class = None
-    brace_count = 0
     in_class = False
 
-    for i, line in enumerate(lines):
-        # Track braces to detect block boundaries
-        brace_count += line.count('{') - line.count('}')
+    # Track braces to detect block boundaries
+    brace_depths = _line_depths(content, starts, ends, '{', '}')
+
+    for i in range(n_lines):
+        brace_count = brace_depths[i]
 
         # Detect class/interface/enum
-        class_match = class_pattern.search(line)
+        class_match = _JAVA_CLASS_RE.search(content, starts[i], ends[i])
         if class_match:
             # Save previous chunk if exists
-            if current_chunk and len('\n'.join(current_chunk)) >= MIN_CHUNK_SIZE:
+            if chunk_start < i and ends[i - 1] - starts[chunk_start] >= MIN_CHUNK_SIZE:
                 chunks.append({
-                    'content': '\n'.join(current_chunk),
+                    'content': content[starts[chunk_start]:ends[i - 1]],
                     'start_line': chunk_start + 1,
                     'end_line': i,
                     'class_name': current_class
                 })
 
             current_class = class_match.group(4)
-            current_chunk = [line]
             chunk_start = i
             in_class = True
             continue
 
-        # Add line to current chunk
-        current_chunk.append(line)
-
         # If class ended (brace count back to 0), potentially split
-        if in_class and brace_count == 0 and current_chunk:
-            if len('\n'.join(current_chunk)) >= MAX_CHUNK_SIZE:
+        if in_class and brace_count == 0:
+            if ends[i] - starts[chunk_start] >= MAX_CHUNK_SIZE:
                 chunks.append({
-                    'content': '\n'.join(current_chunk),
+                    'content': content[starts[chunk_start]:ends[i]],
                     'start_line': chunk_start + 1,
                     'end_line': i + 1,
                     'class_name': current_class
                 })
-                current_chunk = []
                 chunk_start = i + 1
                 in_class = False
 
     # Add final chunk
-    if current_chunk:
+    if chunk_start < n_lines:
         chunks.append({
-            'content': '\n'.join(current_chunk),
+            'content': content[starts[chunk_start]:],
             'start_line': chunk_start + 1,
-            'end_line': len(lines),
+            'end_line': n_lines,
             'class_name': current_class
         })
 
@@ -321,64 +329,57 @@ def chunk_java(content: str, path: str) -> List[Dict]:
 def chunk_javascript(content: str, path: str) -> List[Dict]:
     """Chunk JavaScript/ExtJS code by Ext.define blocks and functions."""
     chunks = []
-    lines = content.split('\n')
+    starts, ends = _line_offsets(content)
+    n_lines = len(starts)
 
-    # Pattern for Ext.define, Ext.create, Ext.application
-    ext_pattern = re.compile(r"Ext\.(define|create|application|override)\s*\(\s*['\"]?([\w.]+)")
-    # Pattern for function declarations
-    func_pattern = re.compile(r'(function\s+\w+\s*\(|const\s+\w+\s*=\s*(async\s+)?function|const\s+\w+\s*=\s*\([^)]*\)\s*=>)')
-
-    current_chunk = []
+    # The current chunk is always lines [chunk_start, i] (see chunk_java)
     chunk_start = 0
     current_component = None
-    brace_count = 0
-    paren_count = 0
     in_ext_define = False
 
-    for i, line in enumerate(lines):
-        # Track braces and parens for Ext.define blocks
-        brace_count += line.count('{') - line.count('}')
-        paren_count += line.count('(') - line.count(')')
+    # Track braces and parens for Ext.define blocks
+    brace_depths = _line_depths(content, starts, ends, '{', '}')
+    paren_depths = _line_depths(content, starts, ends, '(', ')')
+
+    for i in range(n_lines):
+        brace_count = brace_depths[i]
+        paren_count = paren_depths[i]
 
         # Detect Ext.define
-        ext_match = ext_pattern.search(line)
+        ext_match = _EXT_DEFINE_RE.search(content, starts[i], ends[i])
         if ext_match:
             # Save previous chunk
-            if current_chunk and len('\n'.join(current_chunk)) >= MIN_CHUNK_SIZE:
+            if chunk_start < i and ends[i - 1] - starts[chunk_start] >= MIN_CHUNK_SIZE:
                 chunks.append({
-                    'content': '\n'.join(current_chunk),
+                    'content': content[starts[chunk_start]:ends[i - 1]],
                     'start_line': chunk_start + 1,
                     'end_line': i,
                     'component': current_component
                 })
 
             current_component = ext_match.group(2)
-            current_chunk = [line]
             chunk_start = i
             in_ext_define = True
             continue
 
-        current_chunk.append(line)
-
         # If Ext.define block ended, potentially split
-        if in_ext_define and paren_count == 0 and brace_count == 0 and current_chunk:
-            if len('\n'.join(current_chunk)) >= MAX_CHUNK_SIZE or i == len(lines) - 1:
+        if in_ext_define and paren_count == 0 and brace_count == 0:
+            if ends[i] - starts[chunk_start] >= MAX_CHUNK_SIZE or i == n_lines - 1:
                 chunks.append({
-                    'content': '\n'.join(current_chunk),
+                    'content': content[starts[chunk_start]:ends[i]],
                     'start_line': chunk_start + 1,
                     'end_line': i + 1,
                     'component': current_component
                 })
-                current_chunk = []
                 chunk_start = i + 1
                 in_ext_define = False
 
     # Add final chunk
-    if current_chunk:
+    if chunk_start < n_lines:
         chunks.append({
-            'content': '\n'.join(current_chunk),
+            'content': content[starts[chunk_start]:],
             'start_line': chunk_start + 1,
-            'end_line': len(lines),
+            'end_line': n_lines,
             'component': current_component
         })
 
@@ -393,59 +394,52 @@ def chunk_typescript(content: str, path: str) -> List[Dict]:
     """Chunk TypeScript code by interface, type, class, and function declarations."""
     # For TypeScript, use similar logic to JavaScript but also look for interface/type
     chunks = []
-    lines = content.split('\n')
-
-    # Patterns for TypeScript constructs
-    ts_pattern = re.compile(r'^\s*(export\s+)?(interface|type|class|enum)\s+(\w+)')
-    func_pattern = re.compile(r'(function\s+\w+|const\s+\w+\s*=|export\s+(async\s+)?function)')
+    starts, ends = _line_offsets(content)
+    n_lines = len(starts)
 
-    current_chunk = []
+    # The current chunk is always lines [chunk_start, i] (see chunk_java)
     chunk_start = 0
     current_name = None
 
-    for i, line in enumerate(lines):
+    for i in range(n_lines):
         # Detect TypeScript construct
-        ts_match = ts_pattern.search(line)
-        if ts_match and current_chunk and len('\n'.join(current_chunk)) >= MIN_CHUNK_SIZE:
+        ts_match = _TS_DECL_RE.search(content, starts[i], ends[i])
+        if ts_match and chunk_start < i and ends[i - 1] - starts[chunk_start] >= MIN_CHUNK_SIZE:
             # Save previous chunk
             chunks.append({
-                'content': '\n'.join(current_chunk),
+                'content': content[starts[chunk_start]:ends[i - 1]],
                 'start_line': chunk_start + 1,
                 'end_line': i,
                 'component': current_name
             })
-            current_chunk = []
             chunk_start = i
 
         if ts_match:
             current_name = ts_match.group(3)
 
-        current_chunk.append(line)
-
         # Split if chunk too large
-        if len('\n'.join(current_chunk)) >= MAX_CHUNK_SIZE:
+        if ends[i] - starts[chunk_start] >= MAX_CHUNK_SIZE:
             chunks.append({
-                'content': '\n'.join(current_chunk),
+                'content': content[starts[chunk_start]:ends[i]],
                 'start_line': chunk_start + 1,
                 'end_line': i + 1,
                 'component': current_name
             })
-            current_chunk = []
             chunk_start = i + 1
 
     # Add final chunk
-    if current_chunk:
+    if chunk_start < n_lines:
         chunks.append({
-            'content': '\n'.join(current_chunk),
+            'content': content[starts[chunk_start]:],
             'start_line': chunk_start + 1,
-            'end_line': len(lines),
+            'end_line': n_lines,
             'component': current_name
         })
 
     if not chunks:
-        chunks = chunk_default(content, path)
+        return chunk_default(content, path)
 
-    return chunks
+    return _add_metadata(chunks, path)
 
 
 # NOTE: earlier definitions of chunk_yaml (line ~87) and chunk_default (line ~118)
@@ -3,21 +3,49 @@ Python wrapper for code-chunk (Node.js library with advanced AST features).
 Provides contextualized chunking with scope, imports, and signatures.
 
 Two modes:
-  - Single file: chunk_with_codechunk() — spawns Node.js per call (for MCP tool use)
-  - Batch: CodeChunkBatch context manager — one Node.js process for many files
+  - Single file: chunk_with_codechunk() — routed through a shared, lazily
+    started CodeChunkBatch that begins with one worker and grows under
+    concurrent use (set CODE_RAG_CODECHUNK_SUBPROCESS=1 to spawn Node.js
+    per call instead)
+  - Batch: CodeChunkBatch context manager — a pool of long-lived Node.js
+    processes for many files
 """
 
+import atexit
+import itertools
+import logging
+import os
+import queue
+import selectors
 import subprocess
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
+logger = logging.getLogger("code-rag.codechunk")
 
 CHUNKER_SCRIPT = str(Path(__file__).parent / "chunker.mjs")
 CHUNKER_BATCH_SCRIPT = str(Path(__file__).parent / "chunker_batch.mjs")
 
 SUPPORTED_LANGUAGES = ['java', 'typescript', 'javascript', 'python', 'rust', 'go']
 
+# Where memfd exists (Linux), files larger than this are handed to the batch
+# worker through an in-memory file instead of inline in the NDJSON request,
+# skipping the JSON escape/unescape of the whole source. Small files stay
+# inline where the extra syscalls cost more than the copy. Elsewhere (macOS)
+# the only alternative is a temp file on disk, which costs more than the
+# escape, so content is always inline there.
+_INLINE_CONTENT_MAX = 4096
+_HAVE_MEMFD = hasattr(os, 'memfd_create') and os.path.isdir('/proc/self/fd')
+
+# Seconds a batch worker may take to answer one request before it is killed
+# and replaced (same budget as the per-file subprocess path)
+_REQUEST_TIMEOUT = 30
+
 
 def _parse_chunks(chunks_data: list) -> List[Dict]:
     """Convert code-chunk output to our internal chunk format."""
@@ -39,22 +67,111 @@ def _parse_chunks(chunks_data: list) -> List[Dict]:
     return chunks
 
 
-def chunk_with_codechunk(content: str, filepath: str, language: str, max_size: int = None) -> Optional[List[Dict]]:
+# Spawning Node.js per file costs ~50-100ms of process + V8 startup, so
+# single-file calls share one long-lived batch pool. The per-call subprocess
+# path is kept for isolation/debugging.
+_USE_SUBPROCESS = os.getenv("CODE_RAG_CODECHUNK_SUBPROCESS", "0").lower() in ('1', 'true', 'yes')
+
+_global_batch: Optional["CodeChunkBatch"] = None
+_global_batch_failed = False
+_global_batch_lock = threading.Lock()
+
+
+@contextmanager
+def _content_file(data: bytes):
+    """Yield a /proc path a child process can read data from, backed by a
+    memfd (requires _HAVE_MEMFD); closed on exit."""
+    fd = os.memfd_create('code-chunk')
+    try:
+        with open(fd, 'wb', closefd=False) as f:
+            f.write(data)
+        yield f'/proc/{os.getpid()}/fd/{fd}'
+    finally:
+        os.close(fd)
+
+
+def _read_reply(proc: subprocess.Popen, timeout: float) -> bytes:
+    """Read one NDJSON reply line from proc's stdout within timeout seconds.
+
+    Reads the pipe's fd directly (never through proc.stdout's buffer) so the
+    selector sees every byte still pending. Raises on EOF, on timeout and on
+    output past the line, which would put the next reply out of sync.
+    """
+    fd = proc.stdout.fileno()
+    deadline = time.monotonic() + timeout
+    buf = bytearray()
+    with selectors.DefaultSelector() as sel:
+        sel.register(fd, selectors.EVENT_READ)
+        while True:
+            end = buf.find(b'\n')
+            if end >= 0:
+                if end + 1 != len(buf):
+                    raise RuntimeError("worker wrote past the end of its reply")
+                return bytes(buf)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not sel.select(remaining):
+                raise RuntimeError(f"worker did not reply within {timeout}s")
+            data = os.read(fd, 65536)
+            if not data:
+                raise RuntimeError("worker exited")
+            buf += data
+
+
+def _get_batch() -> Optional["CodeChunkBatch"]:
+    """Get or start the shared CodeChunkBatch. Returns None if Node.js can't start."""
+    global _global_batch, _global_batch_failed
+    if _global_batch is not None or _global_batch_failed:
+        return _global_batch
+
+    with _global_batch_lock:
+        if _global_batch is not None or _global_batch_failed:
+            return _global_batch
+        # One worker to start: a single index_file call shouldn't boot a
+        # Node.js process per core. More spawn only under concurrent load.
+        batch = CodeChunkBatch(prestart=1)
+        try:
+            batch.__enter__()
+        except Exception as e:
+            logger.warning("code-chunk batch unavailable, falling back to per-file Node.js: %s", e)
+            batch.__exit__(None, None, None)
+            _global_batch_failed = True
+            return None
+        atexit.register(batch.__exit__, None, None, None)
+        _global_batch = batch
+    return _global_batch
+
+
+def chunk_with_codechunk(content: str, filepath: str, language: str, max_size: int = None,
+                         source_bytes: bytes = None) -> Optional[List[Dict]]:
     """
-    Chunk a single file using code-chunk (spawns Node.js process).
-    Use CodeChunkBatch for bulk indexing instead.
+    Chunk a single file using code-chunk via the shared batch pool.
+    Use CodeChunkBatch directly for bulk indexing.
+
+    source_bytes, if given, must be content.encode('utf-8'); it is reused
+    instead of encoding again.
     """
     if max_size is None:
-        import os
         max_size = int(os.getenv("MAX_CHUNK_SIZE", "3000"))
 
     if language not in SUPPORTED_LANGUAGES:
         return None
 
+    if not _USE_SUBPROCESS:
+        batch = _get_batch()
+        if batch is not None:
+            return batch.chunk(content, filepath, language, max_size=max_size,
+                               source_bytes=source_bytes)
+
+    return _chunk_subprocess(content, filepath, max_size, source_bytes)
+
+
+def _chunk_subprocess(content: str, filepath: str, max_size: int,
+                      source_bytes: bytes = None) -> Optional[List[Dict]]:
+    """Chunk a single file by spawning a dedicated Node.js process."""
     try:
         result = subprocess.run(
             ['node', CHUNKER_SCRIPT, filepath, str(max_size)],
-            input=content.encode('utf-8'),
+            input=source_bytes if source_bytes is not None else content.encode('utf-8'),
             capture_output=True,
             timeout=30
         )
@@ -62,7 +179,7 @@ def chunk_with_codechunk(content: str, filepath: str, language: str, max_size: i
         if result.returncode != 0:
             error = result.stderr.decode('utf-8', errors='ignore')
             if 'Unsupported' not in error:
-                print(f"code-chunk error for {filepath}: {error[:100]}")
+                logger.debug("code-chunk error for %s: %.100s", filepath, error)
             return None
 
         chunks_data = json.loads(result.stdout)
@@ -70,73 +187,175 @@ def chunk_with_codechunk(content: str, filepath: str, language: str, max_size: i
         return chunks if chunks else None
 
     except subprocess.TimeoutExpired:
-        print(f"code-chunk timeout for {filepath}")
+        logger.debug("code-chunk timeout for %s", filepath)
         return None
     except Exception as e:
-        print(f"code-chunk failed for {filepath}: {e}")
+        logger.debug("code-chunk failed for %s: %s", filepath, e)
         return None
 
 
 class CodeChunkBatch:
     """
-    Long-lived Node.js process for batch chunking via NDJSON.
+    Pool of long-lived Node.js processes for batch chunking via NDJSON.
+
+    Each worker handles one request at a time; idle workers are checked out
+    of a queue, so chunk() is thread-safe and chunk_many() keeps every
+    worker busy. Requests carry an id that the worker echoes back.
+
+    prestart workers are spawned on enter (default: all of them); the rest
+    start on demand when chunk() finds no idle worker.
 
     Usage:
         with CodeChunkBatch() as chunker:
             chunks = chunker.chunk(content, filepath, language)
+            results = chunker.chunk_many([(content, filepath, language), ...])
     """
 
-    def __init__(self, max_size: int = None):
+    def __init__(self, max_size: int = None, workers: int = None, prestart: int = None):
         if max_size is None:
-            import os
             max_size = int(os.getenv("MAX_CHUNK_SIZE", "3000"))
+        if workers is None:
+            workers = int(os.getenv("CODE_RAG_CHUNK_WORKERS", "0")) or os.cpu_count() or 1
         self.max_size = max_size
-        self._proc = None
+        self.workers = max(1, workers)
+        self.prestart = self.workers if prestart is None else min(max(1, prestart), self.workers)
+        self._procs: List[subprocess.Popen] = []
+        self._idle: "queue.Queue[subprocess.Popen]" = queue.Queue()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
 
     def __enter__(self):
-        self._proc = subprocess.Popen(
+        for _ in range(self.prestart):
+            proc = self._spawn()
+            self._procs.append(proc)
+            self._idle.put(proc)
+        return self
+
+    @staticmethod
+    def _spawn() -> subprocess.Popen:
+        return subprocess.Popen(
             ['node', CHUNKER_BATCH_SCRIPT],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
         )
-        return self
 
     def __exit__(self, *exc):
-        if self._proc:
-            self._proc.stdin.close()
-            self._proc.wait(timeout=10)
-            self._proc = None
+        for proc in self._procs:
+            try:
+                proc.stdin.close()
+                proc.wait(timeout=10)
+            except Exception:
+                proc.kill()
+        self._procs = []
+        self._idle = queue.Queue()
 
-    def chunk(self, content: str, filepath: str, language: str) -> Optional[List[Dict]]:
-        """Chunk a single file through the long-lived Node.js process."""
+    def chunk(self, content: str, filepath: str, language: str,
+              max_size: int = None, source_bytes: bytes = None) -> Optional[List[Dict]]:
+        """Chunk a single file through the next idle Node.js worker."""
         if language not in SUPPORTED_LANGUAGES:
             return None
-        if not self._proc or self._proc.poll() is not None:
+        if not self._procs:
             return None
 
         try:
-            request = json.dumps({
-                'filepath': filepath,
-                'content': content,
-                'max_size': self.max_size,
-            })
-            self._proc.stdin.write((request + '\n').encode('utf-8'))
-            self._proc.stdin.flush()
-
-            line = self._proc.stdout.readline()
-            if not line:
+            proc = self._idle.get_nowait()
+        except queue.Empty:
+            proc = self._grow() or self._idle.get()
+        try:
+            if proc.poll() is not None:
+                # Worker died (crash or OOM) — replace it so the pool doesn't shrink
+                proc = self._replace(proc)
+            try:
+                return self._request(proc, content, filepath, max_size or self.max_size, source_bytes)
+            except Exception as e:
+                # The worker may hold a half-written request or an unread
+                # reply; every later reply would be off by one, so retire it
+                logger.debug("code-chunk batch failed for %s, restarting worker: %s", filepath, e)
+                proc = self._replace(proc)
                 return None
+        finally:
+            self._idle.put(proc)
 
-            result = json.loads(line)
-            if 'error' in result:
-                if 'Unsupported' not in result['error']:
-                    print(f"code-chunk error for {filepath}: {result['error'][:100]}")
+    def _grow(self) -> Optional[subprocess.Popen]:
+        """Spawn another worker if the pool is below its size. Returns None
+        when it is full or the spawn fails."""
+        with self._lock:
+            if len(self._procs) >= self.workers:
                 return None
+            try:
+                proc = self._spawn()
+            except Exception as e:
+                logger.warning("code-chunk worker spawn failed: %s", e)
+                return None
+            self._procs.append(proc)
+        return proc
 
-            chunks = _parse_chunks(result.get('chunks', []))
-            return chunks if chunks else None
-
+    def _replace(self, old: subprocess.Popen) -> subprocess.Popen:
+        """Kill a worker and swap in a fresh one. Returns the old one if respawn fails."""
+        try:
+            old.kill()
+            old.wait(timeout=5)
+        except Exception:
+            pass
+        try:
+            proc = self._spawn()
         except Exception as e:
-            print(f"code-chunk batch failed for {filepath}: {e}")
+            logger.warning("code-chunk worker respawn failed: %s", e)
+            return old
+        with self._lock:
+            self._procs[self._procs.index(old)] = proc
+        return proc
+
+    def chunk_many(self, files: List[Tuple[str, str, str]]) -> List[Optional[List[Dict]]]:
+        """Chunk (content, filepath, language) tuples across all workers.
+
+        Returns results in input order.
+        """
+        if len(files) <= 1 or self.workers == 1:
+            return [self.chunk(*f) for f in files]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(lambda f: self.chunk(*f), files))
+
+    def _request(self, proc: subprocess.Popen, content: str, filepath: str,
+                 max_size: int, source_bytes: bytes = None) -> Optional[List[Dict]]:
+        """Send one NDJSON request to proc and read its reply.
+
+        Raises if the worker fails, times out or answers out of sync; the
+        caller must then replace it.
+        """
+        if proc.poll() is not None:
+            return None
+
+        request_id = next(self._ids)
+        request = {
+            'id': request_id,
+            'filepath': filepath,
+            'max_size': max_size,
+        }
+        if not _HAVE_MEMFD or len(content) <= _INLINE_CONTENT_MAX:
+            request['content'] = content
+            return self._send(proc, request)
+        if source_bytes is None:
+            source_bytes = content.encode('utf-8')
+        with _content_file(source_bytes) as content_path:
+            request['content_path'] = content_path
+            return self._send(proc, request)
+
+    @staticmethod
+    def _send(proc: subprocess.Popen, request: dict) -> Optional[List[Dict]]:
+        """Write one request line and parse the matching reply line."""
+        filepath = request['filepath']
+        proc.stdin.write((json.dumps(request) + '\n').encode('utf-8'))
+        proc.stdin.flush()
+
+        result = json.loads(_read_reply(proc, _REQUEST_TIMEOUT))
+        if result.get('id') != request['id']:
+            raise RuntimeError(f"reply id {result.get('id')} does not match request {request['id']}")
+        if 'error' in result:
+            if 'Unsupported' not in result['error']:
+                logger.debug("code-chunk error for %s: %.100s", filepath, result['error'])
             return None
+
+        chunks = _parse_chunks(result.get('chunks', []))
+        return chunks if chunks else None
@@ -2,16 +2,24 @@
 # Downloads Qodo-Embed-1-1.5B from HuggingFace and quantizes to Q8 for MLX.
 #
 # The full-precision model is ~5.8 GB. After Q8 quantization it's ~1.6 GB
-# with minimal quality loss.
+# with minimal quality loss. CODE_RAG_EMBED_Q_BITS=4 produces a Q4 model
+# instead (~0.9 GB, less weight bandwidth per matmul, some quality loss);
+# point EMBED_MODEL_PATH at the -q4 directory to use it.
 #
 # Prerequisites: run setup.sh first (creates venv with mlx-embeddings + Qwen2 patch)
 #
 # Usage: ./download-model.sh
+#        CODE_RAG_EMBED_Q_BITS=4 ./download-model.sh
 
 set -euo pipefail
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
-MODEL_DIR="$SCRIPT_DIR/models/qodo-embed-1-1.5b-mlx-q8"
+Q_BITS="${CODE_RAG_EMBED_Q_BITS:-8}"
+case "$Q_BITS" in
+    4|8) ;;
+    *) echo "Error: CODE_RAG_EMBED_Q_BITS must be 4 or 8 (got $Q_BITS)"; exit 1 ;;
+esac
+MODEL_DIR="$SCRIPT_DIR/models/qodo-embed-1-1.5b-mlx-q$Q_BITS"
 PYTHON="$SCRIPT_DIR/venv/bin/python"
 
 if [ ! -f "$PYTHON" ]; then
@@ -27,12 +35,12 @@ if [ -f "$MODEL_DIR/model.safetensors" ] || [ -f "$MODEL_DIR/model-00001-of-0000
 fi
 
 echo "======================================================================"
-echo "Downloading Qodo-Embed-1-1.5B and quantizing to Q8"
+echo "Downloading Qodo-Embed-1-1.5B and quantizing to Q$Q_BITS"
 echo "======================================================================"
 echo ""
 echo "This will:"
 echo "  1. Download the full model from HuggingFace (~5.8 GB)"
-echo "  2. Quantize to 8-bit (Q8, group_size=64) → ~1.6 GB"
+echo "  2. Quantize to $Q_BITS-bit (Q$Q_BITS, group_size=64)"
 echo "  3. Save to $MODEL_DIR"
 echo ""
 echo "This may take several minutes depending on your connection."
@@ -42,12 +50,12 @@ echo ""
 "$PYTHON" -c "
 from mlx_embeddings.utils import convert
 
-print('Downloading and quantizing (Q8, group_size=64)...')
+print('Downloading and quantizing (Q$Q_BITS, group_size=64)...')
 convert(
     hf_path='Qodo/Qodo-Embed-1-1.5B',
     mlx_path='$MODEL_DIR',
     quantize=True,
-    q_bits=8,
+    q_bits=$Q_BITS,
     q_group_size=64,
 )
 print('Done!')
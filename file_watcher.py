@@ -1,23 +1,25 @@
 """
 File watcher for automatic incremental reindexing.
 
-Uses macOS FSEvents (via watchdog) to detect file changes and reindex
-affected files in batches. Designed to handle burst scenarios like
-git checkout without degrading search performance.
+Uses macOS FSEvents to detect file changes and reindex affected files in
+batches. Designed to handle burst scenarios like git checkout without
+degrading search performance.
 
-Pipeline: FSEvents -> watchdog thread -> filter -> asyncio.Queue -> debounce -> batch process
+Pipeline: FSEvents -> native stream batch (or watchdog thread) -> filter
+          -> deque (drained on a tick) -> debounce -> batch process
 """
 
 import asyncio
-import fnmatch
+import collections
 import os
 import sys
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+import _fsevents
 import rag_milvus
 
 # --- Configuration ---
@@ -40,74 +42,137 @@ _WATCH_EXTENSIONS = {
 }
 
 
+# How often the event deque is folded into the pending set. Far below the
+# debounce interval, so it adds no visible latency.
+_DRAIN_INTERVAL = 0.05
+
+
 def _log(msg: str):
     print(f"[watcher] {msg}", file=sys.stderr)
 
 
+# Path helpers for the hot paths: plain str operations instead of building a
+# Path (and its .parts/.suffix/.name) per file.
+
+def _split_name(path: str):
+    """(name, suffix) of a path; suffix is '' when the name has no dot."""
+    name = path.rpartition(os.sep)[2]
+    dot = name.rfind('.')
+    return name, (name[dot:] if dot >= 0 else '')
+
+
+def _merge_events(events) -> Dict[str, str]:
+    """Fold (action, path) events into path -> action, in first-seen order.
+
+    Merge logic: delete always wins over prior actions; deleted then
+    recreated = modified.
+    """
+    merged: Dict[str, str] = {}
+    for action, path in events:
+        if action != 'deleted' and merged.get(path) == 'deleted':
+            action = 'modified'
+        merged[path] = action
+    return merged
+
+
+def _rel_path(path: str, root_prefix: str, project_root: str) -> str:
+    """path relative to the project root; root_prefix is project_root + os.sep."""
+    if path.startswith(root_prefix):
+        return path[len(root_prefix):]
+    return os.path.relpath(path, project_root)
+
+
 # --- FileChangeHandler ---
 
 class FileChangeHandler(FileSystemEventHandler):
-    """Watchdog event handler that filters and forwards changes to asyncio."""
+    """Watchdog event handler that filters and forwards changes to asyncio.
+
+    Accepted events are appended to a deque shared with the ProjectWatcher;
+    deque.append/extend are atomic under the GIL, so the watcher threads never
+    touch the event loop.
+    """
 
-    def __init__(self, project_root: str, change_queue: asyncio.Queue,
-                 loop: asyncio.AbstractEventLoop):
+    def __init__(self, project_root: str, events: collections.deque):
         super().__init__()
         self.project_root = project_root
-        self.change_queue = change_queue
-        self.loop = loop
-        self._excluded_dirs: Optional[set] = None
+        self.events = events
+        self._excluded_dirs: Optional[frozenset] = None
+        self._root_prefix = project_root.rstrip(os.sep) + os.sep
 
-    def _should_handle(self, path: str) -> bool:
-        """Fast pre-filter. Runs in watchdog thread — must be cheap."""
-        p = Path(path)
-        # Config files trigger reload (handled specially in _process_batch)
-        if p.name in ('.ragignore', '.ragconfig'):
-            return True
-        # Extension check
-        if p.suffix not in _WATCH_EXTENSIONS:
-            return False
-        # Dotfiles
-        if p.name.startswith('.'):
-            return False
-        # TypeScript declaration files
-        if p.name.endswith('.d.ts'):
-            return False
-        # Lazy-load excluded dirs (once per handler)
+    def _load_excluded_dirs(self) -> frozenset:
+        """Lazy-load excluded dirs (once per handler, reset on config reload)."""
         if self._excluded_dirs is None:
             self._excluded_dirs = rag_milvus.get_excluded_dirs(
                 project_root=self.project_root)
-        # Excluded directories
-        if self._excluded_dirs & set(p.parts):
-            return False
-        # .ragconfig exclusions
+        return self._excluded_dirs
+
+    def reset_config(self):
+        """Drop the cached exclusions and filter after .ragignore/.ragconfig change."""
+        self._excluded_dirs = None
+        self.__dict__.pop('_should_handle', None)
+
+    def _should_handle(self, path: str) -> bool:
+        """Build the project's filter on first use and bind it over this method."""
+        self._should_handle = self._build_filter()
+        return self._should_handle(path)
+
+    def _build_filter(self) -> Callable[[str], bool]:
+        """Specialize the event pre-filter for the current project config.
+
+        Everything it consults is fixed until the next config reload, so the
+        allowed suffixes (_WATCH_EXTENSIONS minus exclude_extensions), the
+        excluded-dir regex and the exclude_patterns regex are bound into
+        the closure once rather than looked up per event.
+        """
         ragconfig = rag_milvus.load_ragconfig(self.project_root)
-        if p.suffix in ragconfig.get('exclude_extensions', []):
-            return False
-        exclude_patterns = ragconfig.get('exclude_patterns', [])
-        if exclude_patterns:
-            try:
-                rel_path = os.path.relpath(path, self.project_root)
-                if any(fnmatch.fnmatch(rel_path, pat) for pat in exclude_patterns):
-                    return False
-            except ValueError:
-                pass
-        # Skip large files (>1MB)
-        try:
-            if p.exists() and p.stat().st_size > 1024 * 1024:
+        suffixes = frozenset(_WATCH_EXTENSIONS).difference(
+            ragconfig.get('exclude_extensions', []))
+        excluded_dir_re = rag_milvus.excluded_dirs_re(self._load_excluded_dirs())
+        exclude_pattern_re = rag_milvus.get_exclude_pattern_re(self.project_root)
+        root_prefix, project_root, sep = self._root_prefix, self.project_root, os.sep
+
+        def should_handle(path: str) -> bool:
+            """Fast pre-filter. Runs in watchdog thread — must be cheap.
+
+            String work only, no syscalls: the 1MB size limit is enforced when
+            the batch is processed, not per event.
+            """
+            name = path.rpartition(sep)[2]
+            # Config files trigger reload (handled specially in _process_batch)
+            if name == '.ragignore' or name == '.ragconfig':
+                return True
+            # Extension check (.ragconfig exclude_extensions already removed)
+            dot = name.rfind('.')
+            if dot < 0 or name[dot:] not in suffixes:
                 return False
-        except OSError:
-            pass
-        return True
+            # Dotfiles
+            if name.startswith('.'):
+                return False
+            # TypeScript declaration files
+            if name.endswith('.d.ts'):
+                return False
+            # Excluded directories
+            if excluded_dir_re and excluded_dir_re.search(path):
+                return False
+            # .ragconfig exclude_patterns
+            if exclude_pattern_re:
+                try:
+                    if exclude_pattern_re.match(_rel_path(path, root_prefix, project_root)):
+                        return False
+                except ValueError:
+                    pass
+            return True
+
+        return should_handle
 
     def _enqueue(self, action: str, path: str):
-        """Thread-safe enqueue to asyncio loop."""
-        try:
-            self.loop.call_soon_threadsafe(
-                self.change_queue.put_nowait,
-                (action, path)
-            )
-        except RuntimeError:
-            pass  # Loop closed during shutdown
+        """Thread-safe enqueue (no loop wakeup; drained on the next tick)."""
+        self.events.append((action, path))
+
+    def on_batch(self, events):
+        """Native FSEvents batch: filter, then enqueue in one extend."""
+        self.events.extend((action, path) for action, path in events
+                           if self._should_handle(path))
 
     def on_modified(self, event):
         if not event.is_directory and self._should_handle(event.src_path):
@@ -142,16 +207,25 @@ class ProjectWatcher:
         self.project_root = project_root
         self.db_path = db_path
         self.debounce_seconds = debounce_seconds
+        # Python-side quiet period; shortened when FSEvents already coalesces
+        self._debounce_delay = debounce_seconds
         self.max_batch_size = max_batch_size
         self.git_settle_seconds = git_settle_seconds
 
+        self._stream: Optional[_fsevents.FSEventStream] = None
         self._observer: Optional[Observer] = None
         self._handler: Optional[FileChangeHandler] = None
-        self._change_queue: asyncio.Queue = asyncio.Queue()
+        self._events: collections.deque = collections.deque()
         self._drain_task: Optional[asyncio.Task] = None
         self._initial_scan_task: Optional[asyncio.Task] = None
-        self._pending_changes: Dict[str, str] = {}  # path -> action
-        self._debounce_handle: Optional[asyncio.TimerHandle] = None
+        # Raw (action, path) events since the last batch; merged per path
+        # only when the batch is taken (see _merge_events)
+        self._pending_events: List[Tuple[str, str]] = []
+        # Debounce: events only push the deadline forward; one long-lived task
+        # sleeps until it and re-checks, so there is no per-event timer churn
+        self._deadline: float = 0.0
+        self._deadline_set = asyncio.Event()
+        self._debounce_task: Optional[asyncio.Task] = None
         self._processing = False
         self._stopped = False
         self.stats = {
@@ -163,16 +237,32 @@ class ProjectWatcher:
 
     async def start(self):
         """Start watching the project directory."""
-        loop = asyncio.get_event_loop()
-        handler = FileChangeHandler(self.project_root, self._change_queue, loop)
+        handler = FileChangeHandler(self.project_root, self._events)
         self._handler = handler
 
-        self._observer = Observer()
-        self._observer.schedule(handler, self.project_root, recursive=True)
-        self._observer.daemon = True
-        self._observer.start()
+        # Native FSEvents stream on macOS when pyobjc is installed; watchdog
+        # otherwise (or if the stream fails to start). The stream coalesces
+        # for half the debounce window before calling into Python, so only
+        # the other half is left to the deadline below.
+        if _fsevents.AVAILABLE:
+            latency = self.debounce_seconds / 2
+            stream = _fsevents.FSEventStream(self.project_root, handler.on_batch,
+                                             latency=latency)
+            try:
+                stream.start()
+                self._stream = stream
+                self._debounce_delay = self.debounce_seconds - latency
+            except Exception as e:
+                _log(f"Native FSEvents unavailable, using watchdog: {e}")
+
+        if self._stream is None:
+            self._observer = Observer()
+            self._observer.schedule(handler, self.project_root, recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
 
         self._drain_task = asyncio.create_task(self._drain_queue())
+        self._debounce_task = asyncio.create_task(self._debounce_loop())
 
         # Backfill: FSEvents only fires on changes after the watcher is up.
         # Files that exist on disk before code-rag starts (or were added during
@@ -200,11 +290,9 @@ class ProjectWatcher:
         try:
             for root, dirs, files in os.walk(self.project_root, followlinks=False):
                 # Prune excluded dirs in-place so os.walk doesn't descend into them
-                if self._handler._excluded_dirs is None:
-                    self._handler._excluded_dirs = rag_milvus.get_excluded_dirs(
-                        project_root=self.project_root)
+                excluded_dirs = self._handler._load_excluded_dirs()
                 dirs[:] = [d for d in dirs
-                           if d not in self._handler._excluded_dirs
+                           if d not in excluded_dirs
                            and not d.startswith('.')]
 
                 for fname in files:
@@ -250,9 +338,13 @@ class ProjectWatcher:
         """Stop the watcher and cancel pending work."""
         self._stopped = True
 
-        if self._debounce_handle is not None:
-            self._debounce_handle.cancel()
-            self._debounce_handle = None
+        if self._debounce_task is not None:
+            self._debounce_task.cancel()
+            try:
+                await self._debounce_task
+            except asyncio.CancelledError:
+                pass
+            self._debounce_task = None
 
         if self._drain_task is not None:
             self._drain_task.cancel()
@@ -270,6 +362,10 @@ class ProjectWatcher:
                 pass
             self._initial_scan_task = None
 
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream = None
+
         if self._observer is not None:
             self._observer.stop()
             self._observer.join(timeout=5)
@@ -282,35 +378,55 @@ class ProjectWatcher:
              f"batches={self.stats['batches_processed']})")
 
     async def _drain_queue(self):
-        """Continuously read events from the queue into the pending set."""
+        """Every _DRAIN_INTERVAL, move queued events to the pending list.
+
+        A burst of N events costs one wakeup and one debounce reset per tick
+        rather than N of each, and no per-event merging.
+        """
+        events = self._events
         try:
             while True:
-                action, path = await self._change_queue.get()
-
-                # Merge logic: delete always wins over prior actions
-                existing = self._pending_changes.get(path)
-                if action == 'deleted':
-                    self._pending_changes[path] = 'deleted'
-                elif existing == 'deleted':
-                    # Was deleted, now recreated -> modified
-                    self._pending_changes[path] = 'modified'
-                else:
-                    self._pending_changes[path] = action
+                await asyncio.sleep(_DRAIN_INTERVAL)
+                if not events:
+                    continue
+
+                pending = self._pending_events
+                while events:
+                    pending.append(events.popleft())
 
                 self._reset_debounce()
         except asyncio.CancelledError:
             pass
 
-    def _reset_debounce(self):
-        """Reset the debounce timer. Called each time a new event arrives."""
-        if self._debounce_handle is not None:
-            self._debounce_handle.cancel()
+    def _reset_debounce(self, delay: Optional[float] = None):
+        """Push the processing deadline to now + delay (default: the debounce
+        window left after FSEvents' own coalescing).
 
+        Just a float write; _debounce_loop notices the move when it wakes.
+        """
+        if delay is None:
+            delay = self._debounce_delay
+        self._deadline = asyncio.get_event_loop().time() + delay
+        self._deadline_set.set()
+
+    async def _debounce_loop(self):
+        """Run _trigger_processing once the deadline passes without moving."""
         loop = asyncio.get_event_loop()
-        self._debounce_handle = loop.call_later(
-            self.debounce_seconds,
-            lambda: asyncio.ensure_future(self._trigger_processing())
-        )
+        try:
+            while True:
+                await self._deadline_set.wait()
+                remaining = self._deadline - loop.time()
+                if remaining > 0:
+                    # Deadline may be pushed again while we sleep; re-check
+                    await asyncio.sleep(remaining)
+                    continue
+                self._deadline_set.clear()
+                try:
+                    await self._trigger_processing()
+                except Exception as e:
+                    _log(f"{Path(self.project_root).name}/: Processing error: {e}")
+        except asyncio.CancelledError:
+            pass
 
     async def _trigger_processing(self):
         """Called when debounce timer fires."""
@@ -321,36 +437,32 @@ class ProjectWatcher:
         if self._is_git_active():
             short = Path(self.project_root).name
             _log(f"{short}/: Git operation in progress, deferring {self.git_settle_seconds}s...")
-            loop = asyncio.get_event_loop()
-            self._debounce_handle = loop.call_later(
-                self.git_settle_seconds,
-                lambda: asyncio.ensure_future(self._trigger_processing())
-            )
-            return
-
-        # Don't start a new batch while one is processing
-        if self._processing:
-            self._reset_debounce()
+            self._reset_debounce(self.git_settle_seconds)
             return
 
+        # Batches run inline in _debounce_loop, so they never overlap; events
+        # arriving meanwhile re-arm the deadline (and _process_batch re-arms
+        # it for its own overflow)
         await self._process_batch()
 
     def _is_git_active(self) -> bool:
-        """Check if git is mid-operation (.git/index.lock exists)."""
-        git_dir = Path(self.project_root) / '.git'
-        if not git_dir.is_dir():
-            return False
-        return (git_dir / 'index.lock').exists()
+        """Check if git is mid-operation (.git/index.lock exists).
+
+        One stat: without a .git directory the lookup simply fails.
+        """
+        return os.path.exists(os.path.join(self.project_root, '.git', 'index.lock'))
 
     async def _cleanup_excluded_files(self):
         """Remove indexed files that are now excluded by .ragignore/.ragconfig."""
         loop = asyncio.get_event_loop()
         short = Path(self.project_root).name
 
-        excluded_dirs = rag_milvus.get_excluded_dirs(project_root=self.project_root)
+        excluded_dir_re = rag_milvus.excluded_dirs_re(
+            rag_milvus.get_excluded_dirs(project_root=self.project_root))
+        root_prefix = self.project_root.rstrip(os.sep) + os.sep
         ragconfig = rag_milvus.load_ragconfig(self.project_root)
         exclude_ext = set(ragconfig.get('exclude_extensions', []))
-        exclude_patterns = ragconfig.get('exclude_patterns', [])
+        exclude_pattern_re = rag_milvus.get_exclude_pattern_re(self.project_root)
 
         indexed = await loop.run_in_executor(None,
             lambda: rag_milvus.list_indexed_files(db_path=self.db_path))
@@ -361,17 +473,16 @@ class ProjectWatcher:
 
         removed = 0
         for path in all_paths:
-            p = Path(path)
             should_exclude = False
 
-            if excluded_dirs & set(p.parts):
+            if excluded_dir_re and excluded_dir_re.search(path):
                 should_exclude = True
-            elif p.suffix in exclude_ext:
+            elif _split_name(path)[1] in exclude_ext:
                 should_exclude = True
-            elif exclude_patterns:
+            elif exclude_pattern_re:
                 try:
-                    rel_path = os.path.relpath(path, self.project_root)
-                    if any(fnmatch.fnmatch(rel_path, pat) for pat in exclude_patterns):
+                    rel_path = _rel_path(path, root_prefix, self.project_root)
+                    if exclude_pattern_re.match(rel_path):
                         should_exclude = True
                 except ValueError:
                     pass
@@ -385,18 +496,18 @@ class ProjectWatcher:
 
     async def _process_batch(self):
         """Process accumulated changes."""
-        if not self._pending_changes:
+        if not self._pending_events:
             return
 
         self._processing = True
         short = Path(self.project_root).name
 
-        # Snapshot and clear — new events accumulate in a fresh dict
-        batch = dict(self._pending_changes)
-        self._pending_changes.clear()
+        # Snapshot and clear — new events accumulate in a fresh list
+        batch = _merge_events(self._pending_events)
+        self._pending_events = []
 
         # Check for config file changes
-        config_files = {p for p in batch if Path(p).name in ('.ragignore', '.ragconfig')}
+        config_files = {p for p in batch if _split_name(p)[0] in ('.ragignore', '.ragconfig')}
         if config_files:
             # Remove config files from normal processing
             for cf in config_files:
@@ -404,7 +515,7 @@ class ProjectWatcher:
             # Invalidate caches and reload
             rag_milvus.invalidate_ragconfig(self.project_root)
             if self._handler:
-                self._handler._excluded_dirs = None
+                self._handler.reset_config()
             _log(f"{short}/: Config file changed — reloading exclusions")
             try:
                 await self._cleanup_excluded_files()
@@ -414,9 +525,11 @@ class ProjectWatcher:
         # Cap batch size, re-queue overflow
         if len(batch) > self.max_batch_size:
             items = list(batch.items())
-            overflow = dict(items[self.max_batch_size:])
+            overflow = items[self.max_batch_size:]
             batch = dict(items[:self.max_batch_size])
-            self._pending_changes.update(overflow)
+            # Ahead of anything that arrived during config cleanup, so
+            # later events still merge on top of them
+            self._pending_events[:0] = [(a, p) for p, a in overflow]
             _log(f"{short}/: Large batch, processing {len(batch)} now, "
                  f"{len(overflow)} deferred")
 
@@ -443,41 +556,42 @@ class ProjectWatcher:
                     _log(f"Error deleting {Path(path).name}: {e}")
                     errors += 1
 
-            # Phase 2: Handle upserts (embed + write, one at a time)
+            # Phase 2: Handle upserts (chunk all, then one batched embed + write)
+            # One stat per file covers both "still there?" and the size cap
+            # (the watcher thread does no stat at all)
+            to_index = []
             for path in upserts:
-                # File may have disappeared between event and processing
-                if not Path(path).exists():
-                    skipped += 1
-                    continue
                 try:
-                    if Path(path).stat().st_size > 1024 * 1024:
-                        skipped += 1
-                        continue
+                    st = os.stat(path)
                 except OSError:
+                    # File disappeared between event and processing
                     skipped += 1
                     continue
+                if st.st_size > 1024 * 1024:
+                    skipped += 1
+                    continue
+                to_index.append(path)
 
+            if to_index:
                 try:
-                    chunks = await rag_milvus.add_file_async(
-                        path, force=False, db_path=self.db_path)
-                    if chunks > 0:
-                        indexed += 1
-                    else:
-                        skipped += 1
+                    results = await rag_milvus.add_files_batch_async(
+                        to_index, db_path=self.db_path, embed=_embed_shared)
+                    for path, chunks in results.items():
+                        if isinstance(chunks, Exception):
+                            _log(f"Error indexing {Path(path).name}: {chunks}")
+                            errors += 1
+                        elif chunks > 0:
+                            indexed += 1
+                        else:
+                            skipped += 1
                 except Exception as e:
-                    _log(f"Error indexing {Path(path).name}: {e}")
-                    errors += 1
+                    _log(f"{short}/: Error indexing batch of {len(to_index)}: {e}")
+                    errors += len(to_index)
 
-                # Yield control so search requests can proceed
-                await asyncio.sleep(0)
-
-            # MLX cache cleanup
-            if indexed > 0 and indexed % 20 == 0:
+            # MLX cache cleanup, once per batch and only past the high-water mark
+            if indexed > 0:
                 try:
-                    import mlx.core as mx
-                    from mlx_gpu import GPU
-                    with GPU:
-                        mx.clear_cache()
+                    rag_milvus.trim_mlx_cache()
                 except Exception:
                     pass
 
@@ -505,10 +619,69 @@ class ProjectWatcher:
         finally:
             self._processing = False
             # If more changes accumulated during processing, trigger again
-            if self._pending_changes:
+            if self._pending_events:
                 self._reset_debounce()
 
 
+# --- Shared embedding worker ---
+# Every watcher's batch hands its chunk texts to one worker, which merges the
+# requests queued at the same time (e.g. several projects changing during one
+# git operation) into one run of full MLX batches.
+
+# Stop pulling further requests into a run once it holds this many texts
+_EMBED_COALESCE_MAX = 128
+
+_embed_queue: Optional[asyncio.Queue] = None
+_embed_worker_task: Optional[asyncio.Task] = None
+
+
+def _ensure_embed_worker():
+    """Start the shared embed worker on the running loop (once)."""
+    global _embed_queue, _embed_worker_task
+    if _embed_worker_task is None or _embed_worker_task.done():
+        _embed_queue = asyncio.Queue()
+        _embed_worker_task = asyncio.create_task(_embed_worker(_embed_queue))
+
+
+async def _embed_shared(texts: List[str]) -> List[List[float]]:
+    """Embed texts through the shared worker."""
+    _ensure_embed_worker()
+    future = asyncio.get_event_loop().create_future()
+    _embed_queue.put_nowait((texts, future))
+    return await future
+
+
+async def _embed_worker(queue: asyncio.Queue):
+    """Take one request, coalesce whatever else is queued, embed once, and
+    hand each request its slice of the result."""
+    try:
+        while True:
+            jobs = [await queue.get()]
+            total = len(jobs[0][0])
+            while total < _EMBED_COALESCE_MAX and not queue.empty():
+                job = queue.get_nowait()
+                jobs.append(job)
+                total += len(job[0])
+
+            texts = [t for job_texts, _ in jobs for t in job_texts]
+            try:
+                embeddings = await rag_milvus.embed_batched_async(texts)
+            except Exception as e:
+                for _, future in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            start = 0
+            for job_texts, future in jobs:
+                end = start + len(job_texts)
+                if not future.done():
+                    future.set_result(embeddings[start:end])
+                start = end
+    except asyncio.CancelledError:
+        pass
+
+
 # --- Watcher Manager ---
 
 _watchers: Dict[str, ProjectWatcher] = {}
@@ -522,6 +695,7 @@ async def ensure_watcher(project_root: str, db_path: str) -> Optional[ProjectWat
     if project_root in _watchers:
         return _watchers[project_root]
 
+    _ensure_embed_worker()
     watcher = ProjectWatcher(
         project_root=project_root,
         db_path=db_path,
@@ -536,16 +710,25 @@ async def ensure_watcher(project_root: str, db_path: str) -> Optional[ProjectWat
 
 async def stop_all_watchers():
     """Stop all active watchers. Called during server shutdown."""
+    global _embed_worker_task
     for watcher in list(_watchers.values()):
         await watcher.stop()
     _watchers.clear()
 
+    if _embed_worker_task is not None:
+        _embed_worker_task.cancel()
+        try:
+            await _embed_worker_task
+        except asyncio.CancelledError:
+            pass
+        _embed_worker_task = None
+
 
 def get_watcher_status() -> Dict:
     """Return status of all active watchers."""
     return {
         root: {
-            'pending': len(w._pending_changes),
+            'pending': len({path for _, path in w._pending_events}),
             'processing': w._processing,
             'stats': dict(w.stats),
         }
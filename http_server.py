@@ -120,8 +120,9 @@ async def lifespan(app: Starlette):
     try:
         print("[HTTP] Pre-loading MLX model...", file=sys.stderr)
         rag_milvus.get_mlx_model()
+        rag_milvus.warmup_model()
         _model_loaded = True
-        print("[HTTP] MLX model loaded.", file=sys.stderr)
+        print("[HTTP] MLX model loaded and warmed up.", file=sys.stderr)
     except Exception as e:
         print(f"[HTTP] Warning: Could not pre-load model: {e}", file=sys.stderr)
 
@@ -180,11 +181,19 @@ def _handle_signal(signum, frame):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+        format="%(asctime)s %(name)s %(levelname)s: %(message)s",
+    )
     signal.signal(signal.SIGTERM, _handle_signal)
 
+    # uvicorn's defaults already use uvloop and httptools when they are
+    # installed (optional deps). No websocket routes, so skip loading a
+    # websocket implementation at all.
     uvicorn.run(
         app,
         host=HOST,
         port=PORT,
         log_level="warning",
+        ws="none",
     )
@@ -6,6 +6,7 @@ The index is stored at {target_path}/.code-rag/milvus.db alongside the project.
 """
 
 import argparse
+import logging
 import os
 import sys
 import time
@@ -14,10 +15,20 @@ from pathlib import Path
 import rag_milvus
 
 
+# Minimum seconds between progress redraws (the final one always draws)
+_PROGRESS_INTERVAL = 0.05
+_last_progress = 0.0
+
+
 def progress(current: int, total: int, filename: str = ""):
-    """Print progress bar."""
+    """Print progress bar, redrawing at most every _PROGRESS_INTERVAL."""
+    global _last_progress
     if total <= 0:
         return
+    now = time.monotonic()
+    if current != total and now - _last_progress < _PROGRESS_INTERVAL:
+        return
+    _last_progress = now
     pct = int((current / total) * 100)
     bar_len = 30
     filled = int((current / total) * bar_len)
@@ -132,4 +143,8 @@ def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+        format="%(asctime)s %(name)s %(levelname)s: %(message)s",
+    )
     main()
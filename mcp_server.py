@@ -5,6 +5,7 @@ For persistent HTTP server, see http_server.py.
 """
 
 import asyncio
+import logging
 import os
 import sys
 
@@ -48,4 +49,8 @@ async def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+        format="%(asctime)s %(name)s %(levelname)s: %(message)s",
+    )
     asyncio.run(main())
@@ -7,13 +7,15 @@ Adapted from qwen3.py. Key differences from Qwen3:
 - attention_bias defaults to True
 """
 
+import functools
 import logging
 import math
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import mlx.core as mx
 import mlx.nn as nn
+import numpy as np
 
 from .base import BaseModelArgs, BaseModelOutput, normalize_embeddings
 
@@ -21,16 +23,82 @@ from .base import BaseModelArgs, BaseModelOutput, normalize_embeddings
 def last_token_pool(
     last_hidden_states: mx.array, attention_mask: Optional[mx.array] = None
 ) -> mx.array:
+    """Hidden state at each sequence's last non-padding token.
+
+    The last kept position is L - 1 - argmax of the reversed mask, which is
+    right for left and right padding alike, so there is no host-side
+    padding check; one take_along_axis gathers the rows.
+    """
     if attention_mask is None:
         return last_hidden_states[:, -1]
 
-    left_padding = attention_mask[:, -1].sum() == attention_mask.shape[0]
-    if left_padding:
-        return last_hidden_states[:, -1]
-    else:
-        sequence_lengths = attention_mask.sum(axis=1) - 1
-        batch_size = last_hidden_states.shape[0]
-        return last_hidden_states[mx.arange(batch_size), sequence_lengths]
+    batch_size, seq_len, hidden_size = last_hidden_states.shape
+    last = seq_len - 1 - mx.argmax(attention_mask[:, ::-1], axis=1)
+    index = mx.broadcast_to(last.reshape(batch_size, 1, 1), (batch_size, 1, hidden_size))
+    return mx.take_along_axis(last_hidden_states, index, axis=1).squeeze(1)
+
+
+def _fuse_projections(weights: dict, parts: List[str], fused: str) -> dict:
+    """Concatenate sibling projections (e.g. mlp.gate_proj.* and mlp.up_proj.*)
+    along the output axis into one fused Linear's keys (mlp.gate_up_proj.*).
+
+    Applies to every leaf the parts share: weight and bias, and the
+    scales/biases of quantized checkpoints, all of which are laid out
+    output-features first. Checkpoints saved already fused pass through.
+    """
+    marker = f".{parts[0]}."
+    for key in [k for k in weights if marker in k]:
+        prefix, _, leaf = key.rpartition(marker)
+        names = [f"{prefix}.{part}.{leaf}" for part in parts]
+        if all(name in weights for name in names):
+            weights[f"{prefix}.{fused}.{leaf}"] = mx.concatenate(
+                [weights.pop(name) for name in names], axis=0
+            )
+    return weights
+
+
+def _expand_kv(x: mx.array, groups: int) -> mx.array:
+    """(B, kv_heads, L, D) -> (B, kv_heads * groups, L, D), broadcasting a
+    group axis instead of mx.repeat (same head order)."""
+    bsz, kv_heads, seq_len, head_dim = x.shape
+    x = mx.broadcast_to(x[:, :, None], (bsz, kv_heads, groups, seq_len, head_dim))
+    return x.reshape(bsz, kv_heads * groups, seq_len, head_dim)
+
+
+def _manual_sdpa(
+    queries: mx.array, keys: mx.array, values: mx.array, scale: float,
+    mask: Union[None, str, mx.array] = None,
+) -> mx.array:
+    """Unfused attention, for MLX builds whose fast SDPA rejects our shapes."""
+    groups = queries.shape[1] // keys.shape[1]
+    if groups > 1:
+        keys = _expand_kv(keys, groups)
+        values = _expand_kv(values, groups)
+    scores = (queries @ keys.transpose(0, 1, 3, 2)) * scale
+    if isinstance(mask, str):  # "causal"
+        q_len = queries.shape[2]
+        scores = mx.where(mx.tril(mx.ones((q_len, q_len), dtype=mx.bool_)), scores, -mx.inf)
+    elif mask is not None:
+        scores = scores + mask
+    return mx.softmax(scores, axis=-1) @ values
+
+
+@functools.lru_cache(maxsize=None)
+def _select_sdpa(head_dim: int, groups: int):
+    """Probe mx.fast.scaled_dot_product_attention once per layer geometry
+    (GQA, causal string mask and additive mask) and return it, or
+    _manual_sdpa if it fails; the forward pass then needs no try/except."""
+    q = mx.zeros((1, groups, 2, head_dim))
+    kv = mx.zeros((1, 1, 2, head_dim))
+    try:
+        mx.eval(
+            mx.fast.scaled_dot_product_attention(q, kv, kv, scale=1.0, mask="causal"),
+            mx.fast.scaled_dot_product_attention(q, kv, kv, scale=1.0, mask=mx.zeros((1, 1, 2, 2))),
+        )
+        return mx.fast.scaled_dot_product_attention
+    except Exception as e:
+        logging.warning(f"Fast attention unavailable, using fallback: {e}")
+        return _manual_sdpa
 
 
 @dataclass
@@ -78,12 +146,14 @@ class ModelArgs(BaseModelArgs):
 class Qwen2MLP(nn.Module):
     def __init__(self, config: ModelArgs):
         super().__init__()
-        self.gate_proj = nn.Linear(config.hidden_size, config.intermediate_size, bias=False)
-        self.up_proj = nn.Linear(config.hidden_size, config.intermediate_size, bias=False)
+        # gate_proj and up_proj packed into one matmul over the same input;
+        # Model.sanitize concatenates the checkpoint's separate weights
+        self.gate_up_proj = nn.Linear(config.hidden_size, 2 * config.intermediate_size, bias=False)
         self.down_proj = nn.Linear(config.intermediate_size, config.hidden_size, bias=False)
 
     def __call__(self, x: mx.array) -> mx.array:
-        return self.down_proj(nn.silu(self.gate_proj(x)) * self.up_proj(x))
+        gate, up = mx.split(self.gate_up_proj(x), 2, axis=-1)
+        return self.down_proj(nn.silu(gate) * up)
 
 
 class Qwen2Attention(nn.Module):
@@ -97,11 +167,18 @@ class Qwen2Attention(nn.Module):
         self.num_key_value_heads = config.num_key_value_heads
         self.num_key_value_groups = self.num_heads // self.num_key_value_heads
         self.rope_theta = config.rope_theta
-
-        # q/k/v have bias=True, o_proj has bias=False (Qwen2 convention)
-        self.q_proj = nn.Linear(self.hidden_size, self.num_heads * self.head_dim, bias=True)
-        self.k_proj = nn.Linear(self.hidden_size, self.num_key_value_heads * self.head_dim, bias=True)
-        self.v_proj = nn.Linear(self.hidden_size, self.num_key_value_heads * self.head_dim, bias=True)
+        self.scale = 1.0 / math.sqrt(self.head_dim)
+        self._sdpa = _select_sdpa(self.head_dim, self.num_key_value_groups)
+
+        # q/k/v have bias=True, o_proj has bias=False (Qwen2 convention).
+        # q/k/v are packed into one matmul, output laid out [q | k | v];
+        # Model.sanitize concatenates the checkpoint's separate weights
+        self.qk_dim = (self.num_heads + self.num_key_value_heads) * self.head_dim
+        self.qkv_proj = nn.Linear(
+            self.hidden_size,
+            (self.num_heads + 2 * self.num_key_value_heads) * self.head_dim,
+            bias=True,
+        )
         self.o_proj = nn.Linear(self.num_heads * self.head_dim, self.hidden_size, bias=False)
 
         # No q_norm/k_norm in Qwen2 (unlike Qwen3)
@@ -111,46 +188,43 @@ class Qwen2Attention(nn.Module):
     def __call__(self, hidden_states: mx.array, attention_mask: Optional[mx.array] = None, **kwargs) -> mx.array:
         bsz, q_len, _ = hidden_states.shape
 
-        query_states = self.q_proj(hidden_states)
-        key_states = self.k_proj(hidden_states)
-        value_states = self.v_proj(hidden_states)
+        qkv = self.qkv_proj(hidden_states)
+        qk, value_states = qkv[..., :self.qk_dim], qkv[..., self.qk_dim:]
 
-        query_states = query_states.reshape(bsz, q_len, self.num_heads, self.head_dim).transpose(0, 2, 1, 3)
-        key_states = key_states.reshape(bsz, q_len, self.num_key_value_heads, self.head_dim).transpose(0, 2, 1, 3)
         value_states = value_states.reshape(bsz, q_len, self.num_key_value_heads, self.head_dim).transpose(0, 2, 1, 3)
 
         # No QK norm in Qwen2
 
-        query_states = self.rotary_emb(query_states)
-        key_states = self.rotary_emb(key_states)
-
-        if self.num_key_value_groups > 1:
-            key_states = mx.repeat(key_states, self.num_key_value_groups, axis=1)
-            value_states = mx.repeat(value_states, self.num_key_value_groups, axis=1)
+        # RoPE depends only on position, so Q and K heads (adjacent in the
+        # packed projection) go through one rotary_emb call and are split after
+        qk = qk.reshape(bsz, q_len, self.num_heads + self.num_key_value_heads, self.head_dim)
+        qk = self.rotary_emb(qk.transpose(0, 2, 1, 3))
+        query_states = qk[:, :self.num_heads]
+        key_states = qk[:, self.num_heads:]
 
-        scale = 1.0 / math.sqrt(self.head_dim)
-
-        try:
-            attn_output = mx.fast.scaled_dot_product_attention(
-                query_states, key_states, value_states, scale=scale, mask=attention_mask
-            )
-        except Exception as e:
-            logging.warning(f"Fast attention failed, using fallback: {e}")
-            attn_weights = (query_states @ key_states.transpose(0, 1, 3, 2)) * scale
-            if attention_mask is not None:
-                attn_weights = attn_weights + attention_mask
-            attn_weights = mx.softmax(attn_weights, axis=-1)
-            attn_output = attn_weights @ value_states
+        # Fast SDPA handles grouped-query attention itself (K/V keep their
+        # num_key_value_heads), so K/V are never expanded on this path
+        attn_output = self._sdpa(
+            query_states, key_states, value_states, scale=self.scale, mask=attention_mask
+        )
 
         attn_output = attn_output.transpose(0, 2, 1, 3).reshape(bsz, q_len, self.num_heads * self.head_dim)
         return self.o_proj(attn_output)
 
 
 class Qwen2DecoderLayer(nn.Module):
+    # The RMSNorm weights are deliberately not folded into qkv_proj /
+    # gate_up_proj at load time: the shipped checkpoints are Q8, where the
+    # packed weights can only be rescaled by dequantize-scale-requantize
+    # (a fresh rounding error), and nn.RMSNorm is already one fused kernel
+    # whose weight multiply costs nothing extra.
+
     def __init__(self, config: ModelArgs):
         super().__init__()
         self.self_attn = Qwen2Attention(config)
         self.mlp = Qwen2MLP(config)
+        # nn.RMSNorm is a thin wrapper over mx.fast.rms_norm (one fused Metal
+        # kernel) in every MLX release requirements.txt allows (>=0.30)
         self.input_layernorm = nn.RMSNorm(config.hidden_size, eps=config.rms_norm_eps)
         self.post_attention_layernorm = nn.RMSNorm(config.hidden_size, eps=config.rms_norm_eps)
 
@@ -168,29 +242,60 @@ class Qwen2DecoderLayer(nn.Module):
 
 
 class Qwen2Model(nn.Module):
+    # Distinct (seq_length, dtype) causal masks kept; batches are padded to
+    # the longest input, so only a handful of lengths recur
+    MASK_CACHE_SIZE = 8
+
     def __init__(self, config: ModelArgs):
         super().__init__()
         self.config = config
         self.embed_tokens = nn.Embedding(config.vocab_size, config.hidden_size)
         self.layers = [Qwen2DecoderLayer(config) for _ in range(config.num_hidden_layers)]
         self.norm = nn.RMSNorm(config.hidden_size, eps=config.rms_norm_eps)
+        # Underscore prefix keeps the cache out of the module's parameters
+        self._mask_cache: Dict[Tuple[int, mx.Dtype], mx.array] = {}
 
     def _create_causal_mask(self, seq_length: int, dtype: mx.Dtype) -> mx.array:
-        mask = mx.tril(mx.ones((seq_length, seq_length), dtype=mx.bool_))
-        mask = mx.where(mask, 0.0, -mx.inf).astype(dtype)
-        return mx.expand_dims(mask, axis=(0, 1))
-
-    def __call__(self, input_ids: mx.array, attention_mask: Optional[mx.array] = None, **kwargs) -> mx.array:
+        key = (seq_length, dtype)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = mx.tril(mx.ones((seq_length, seq_length), dtype=mx.bool_))
+            mask = mx.where(mask, 0.0, -mx.inf).astype(dtype)
+            mask = mx.expand_dims(mask, axis=(0, 1))
+            # Materialize now so the cache holds a constant buffer that later
+            # graphs read as a leaf, not a lazy graph evaluated mid-forward
+            mx.eval(mask)
+            if len(self._mask_cache) >= self.MASK_CACHE_SIZE:
+                # FIFO eviction (dicts keep insertion order)
+                del self._mask_cache[next(iter(self._mask_cache))]
+            self._mask_cache[key] = mask
+        return mask
+
+    def __call__(self, input_ids: mx.array, attention_mask: Optional[mx.array] = None,
+                 causal_only: bool = False, **kwargs) -> mx.array:
         batch_size, seq_length = input_ids.shape
         hidden_states = self.embed_tokens(input_ids)
 
-        if attention_mask is None:
+        if causal_only:
+            # No padding anywhere: fast SDPA applies the causal mask itself,
+            # so no (B, 1, L, L) mask is built or read
+            attention_mask = "causal"
+        elif attention_mask is None:
             attention_mask = self._create_causal_mask(seq_length, hidden_states.dtype)
         elif attention_mask.ndim == 2:
-            padding_mask = attention_mask[:, None, None, :]
-            padding_mask = mx.where(padding_mask == 0, -mx.inf, 0.0).astype(hidden_states.dtype)
+            # One where() broadcasting the (B, 1, 1, L) keep-mask over the
+            # cached (1, 1, L, L) causal mask, straight to (B, 1, L, L)
             causal_mask = self._create_causal_mask(seq_length, hidden_states.dtype)
-            attention_mask = causal_mask + padding_mask
+            attention_mask = mx.where(
+                attention_mask[:, None, None, :].astype(mx.bool_),
+                causal_mask,
+                mx.array(-mx.inf, dtype=hidden_states.dtype),
+            )
+        elif (mx.issubdtype(attention_mask.dtype, mx.floating)
+              and attention_mask.dtype != hidden_states.dtype):
+            # Caller-built additive mask: fast SDPA wants it in q/k/v's dtype,
+            # so cast once here rather than in every layer's kernel
+            attention_mask = attention_mask.astype(hidden_states.dtype)
 
         for layer in self.layers:
             hidden_states = layer(hidden_states, attention_mask=attention_mask)
@@ -214,9 +319,20 @@ class Model(nn.Module):
         batch_size, seq_len = input_ids.shape
         if attention_mask is None:
             attention_mask = mx.ones((batch_size, seq_len), dtype=mx.int32)
-
-        last_hidden_state = self.model(input_ids, attention_mask=attention_mask)
-        pooled_output = last_token_pool(last_hidden_state, attention_mask)
+            causal_only = True
+        elif attention_mask.ndim == 2:
+            # Unpadded batches (e.g. a single query) need no explicit mask.
+            # The (B, L) tokenizer mask is a leaf built from host data, so
+            # reading it through the buffer protocol evaluates nothing and
+            # launches no kernel; mask.all().item() would queue a reduction
+            # and wait on the GPU stream.
+            causal_only = bool(np.asarray(attention_mask).all())
+        else:
+            causal_only = False
+
+        last_hidden_state = self.model(input_ids, attention_mask=attention_mask, causal_only=causal_only)
+        # Unpadded: every sequence ends at the last position
+        pooled_output = last_token_pool(last_hidden_state, None if causal_only else attention_mask)
         text_embeds = normalize_embeddings(pooled_output)
 
         return BaseModelOutput(text_embeds=text_embeds, last_hidden_state=last_hidden_state)
@@ -233,4 +349,5 @@ class Model(nn.Module):
             else:
                 new_key = key
             sanitized[new_key] = value
-        return sanitized
+        _fuse_projections(sanitized, ["q_proj", "k_proj", "v_proj"], "qkv_proj")
+        return _fuse_projections(sanitized, ["gate_proj", "up_proj"], "gate_up_proj")
@@ -11,6 +11,7 @@ Results merged with Reciprocal Rank Fusion (RRF).
 
 import json
 import os
+import stat
 
 # Block all HuggingFace network access at runtime.
 # Models must be pre-downloaded via setup.sh / download-model.sh.
@@ -21,13 +22,17 @@ from pymilvus import MilvusClient, DataType
 from mlx_embeddings.utils import load as mlx_load, generate as mlx_generate
 import mlx.core as mx
 from mlx_gpu import GPU
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 import asyncio
+import collections
+import functools
 import logging
 import hashlib
 import fnmatch
+import re
 import yaml
 import chunking  # Clean chunking utilities (no PyTorch/ChromaDB)
 import nl_descriptions
@@ -127,6 +132,7 @@ def get_mlx_model():
         model_name = Path(_MODEL_PATH).name
         print(f"Loading {model_name} from {_MODEL_PATH}...")
         _mlx_model, _mlx_tokenizer = mlx_load(_MODEL_PATH)
+        _set_wired_limit()
         print(f"{model_name} ready ({_EMBED_DIM} dims)")
 
     return _mlx_model, _mlx_tokenizer
@@ -155,10 +161,47 @@ def _get_query_instruction() -> str:
     return _QUERY_INSTRUCTION
 
 
+# MLX keeps freed Metal buffers cached for reuse. Clearing that cache after
+# every call makes each batch start with a cold allocator, so it is only
+# cleared once it grows past this high-water mark.
+_MLX_CACHE_HIGH_WATER = int(os.getenv("CODE_RAG_MLX_CACHE_HIGH_WATER_MB", "2048")) * 1024 * 1024
+
+
+# Wired (non-pageable) Metal memory for the resident model, so its weights
+# and reused buffers are not paged out between sparse watcher batches.
+# 0 leaves MLX's default.
+_MLX_WIRED_LIMIT = int(os.getenv("CODE_RAG_MLX_WIRED_LIMIT_MB", "2048")) * 1024 * 1024
+
+
+def _set_wired_limit():
+    """Apply _MLX_WIRED_LIMIT, capped at the device's recommended working set."""
+    if _MLX_WIRED_LIMIT <= 0:
+        return
+    try:
+        cap = mx.device_info().get("max_recommended_working_set_size", _MLX_WIRED_LIMIT)
+        mx.set_wired_limit(min(_MLX_WIRED_LIMIT, cap))
+    except Exception as e:
+        logger.warning("Could not set MLX wired limit: %s", e)
+
+
+def trim_mlx_cache() -> bool:
+    """Clear MLX's buffer cache if it is above the high-water mark.
+
+    Returns True if it cleared. Takes the GPU lock (re-entrant, so callers
+    may already hold it).
+    """
+    with GPU:
+        if mx.get_cache_memory() <= _MLX_CACHE_HIGH_WATER:
+            return False
+        mx.clear_cache()
+        mx.reset_peak_memory()
+    return True
+
+
 def embed_texts(texts: List[str]) -> List[List[float]]:
     """Embed texts (documents/passages) using MLX. No query instruction added.
 
-    Holds the GPU lock for the duration of generation + cache clear so the
+    Holds the GPU lock for the duration of generation + cache trim so the
     description model running on another thread doesn't collide on the Metal
     command buffer.
     """
@@ -166,7 +209,7 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
     with GPU:
         output = mlx_generate(model, tokenizer, texts=texts)
         embeddings = output.text_embeds.tolist()
-        mx.clear_cache()
+        trim_mlx_cache()
     return embeddings
 
 
@@ -177,6 +220,19 @@ def embed_query(query: str) -> List[float]:
     return embed_texts([text])[0]
 
 
+def warmup_model(batch_size: int = 8):
+    """Run throwaway embeddings after load.
+
+    MLX materializes weights lazily and compiles Metal kernels per shape on
+    first use; doing both here keeps that cost off the first real request.
+    Two passes, because attention takes a different path for each: a single
+    text (search queries; no padding, causal-only attention) and a batch of
+    different lengths (indexing; padded, so attention runs with a mask).
+    """
+    embed_texts(["warmup"])
+    embed_texts([" ".join(["warmup"] * (i + 1)) for i in range(batch_size)])
+
+
 # --- Client management ---
 
 # Ephemeral session client (CLI batch indexing)
@@ -413,7 +469,18 @@ def add_documents(documents: List[str], metadatas: List[Dict], ids: List[str],
             augmented embedding (description + code) while storing only the code.
     """
     embeddings = embed_texts(documents_for_embed if documents_for_embed else documents)
+    return _write_documents(documents, metadatas, ids, embeddings,
+                            content_hash=content_hash, db_path=db_path)
+
+
+def _write_documents(documents: List[str], metadatas: List[Dict], ids: List[str],
+                     embeddings: List[List[float]], content_hash: Optional[str] = None,
+                     db_path: Optional[str] = None) -> int:
+    """Insert already-embedded documents into Milvus and the FTS sidecar.
 
+    A 'content_hash' key in a metadata dict overrides content_hash for that
+    document (watcher batches write several files in one insert).
+    """
     data = []
     for i, (doc, meta, doc_id, emb) in enumerate(zip(documents, metadatas, ids, embeddings)):
         int_id = hash(doc_id) & 0x7FFFFFFFFFFFFFFF
@@ -425,7 +492,7 @@ def add_documents(documents: List[str], metadatas: List[Dict], ids: List[str],
             "doc_id": doc_id,
             **meta
         }
-        if content_hash:
+        if content_hash and "content_hash" not in doc_data:
             doc_data["content_hash"] = content_hash
         data.append(doc_data)
 
@@ -692,28 +759,48 @@ def list_indexed_files(db_path: Optional[str] = None) -> Dict:
 
 def add_file(path: str, force: bool = False, db_path: Optional[str] = None) -> int:
     """Add a file to Milvus (uses chunking for chunking)."""
+    return _add_prepared(_prepare_file(path, force=force, db_path=db_path), db_path)
+
+
+def _add_prepared(prepared: Optional[Dict], db_path: Optional[str] = None) -> int:
+    """Embed and write one file's _build_documents output. Returns chunk count."""
+    if prepared is None:
+        return 0
+
+    add_documents(prepared['docs'], prepared['metas'], prepared['ids'],
+                  content_hash=prepared['content_hash'], db_path=db_path,
+                  documents_for_embed=prepared['docs_for_embed'])
+
+    return len(prepared['docs'])
+
+
+def _prepare_file(path: str, force: bool = False, db_path: Optional[str] = None) -> Optional[Dict]:
+    """Everything add_file does before embedding: hash check, read + chunk,
+    pre-delete and NL descriptions.
+
+    Returns None if the file is unchanged or yields no chunks.
+    """
     abs_path = str(Path(path).absolute())
 
     if not force and not file_needs_indexing(abs_path, db_path):
-        return 0
+        return None
+
+    content_hash, chunks = _read_and_chunk(path, db_path)
+    return _build_documents(abs_path, content_hash, chunks, db_path)
 
-    # Clear any prior chunks for this path before inserting fresh ones.
-    # Use delete_by_path so BOTH the Milvus collection and the FTS index are
-    # cleaned — a bare client.delete on the collection alone leaves stale FTS
-    # rows that resurface later as fragmentary chunks (e.g. lines 1-5 next to
-    # full-doc chunks after a chunker change).
-    try:
-        delete_by_path(abs_path, db_path)
-    except Exception as e:
-        logger.warning("Pre-delete failed for %s (continuing): %s", abs_path, e)
 
+def _read_and_chunk(path: str, db_path: Optional[str] = None) -> Tuple[str, List[Dict]]:
+    """Hash and chunk a file, applying .ragconfig type_overrides.
+
+    Touches no index state and no GPU, so it is safe to run for many files
+    concurrently. Returns (content_hash, chunks).
+    """
     content_hash = compute_file_hash(path)
     chunks = chunking.chunk_file(path)
-    if not chunks:
-        return 0
 
     # Apply type_overrides from .ragconfig
-    if db_path:
+    if chunks and db_path:
+        abs_path = str(Path(path).absolute())
         _project_root = str(Path(db_path).parent.parent)
         type_overrides = load_ragconfig(_project_root).get('type_overrides', [])
         if type_overrides:
@@ -724,6 +811,34 @@ def add_file(path: str, force: bool = False, db_path: Optional[str] = None) -> i
                         chunk['type'] = override['type']
                     break
 
+    return content_hash, chunks
+
+
+def _predelete(abs_path: str, db_path: Optional[str] = None):
+    """Clear any prior chunks for this path before inserting fresh ones.
+
+    Uses delete_by_path so BOTH the Milvus collection and the FTS index are
+    cleaned — a bare client.delete on the collection alone leaves stale FTS
+    rows that resurface later as fragmentary chunks (e.g. lines 1-5 next to
+    full-doc chunks after a chunker change).
+    """
+    try:
+        delete_by_path(abs_path, db_path)
+    except Exception as e:
+        logger.warning("Pre-delete failed for %s (continuing): %s", abs_path, e)
+
+
+def _build_documents(abs_path: str, content_hash: str, chunks: List[Dict],
+                     db_path: Optional[str] = None, predelete: bool = True) -> Optional[Dict]:
+    """Pre-delete the file's old chunks (unless predelete is False) and build
+    what add_documents needs (docs, metas, ids, descriptions). Returns None if
+    there are no chunks."""
+    if predelete:
+        _predelete(abs_path, db_path)
+
+    if not chunks:
+        return None
+
     # Generate NL descriptions if enabled (env var or descriptions.db exists)
     desc_enabled = nl_descriptions.is_enabled(db_path=db_path)
     descriptions = nl_descriptions.describe_chunks(chunks, db_path=db_path) if desc_enabled else [None] * len(chunks)
@@ -751,10 +866,119 @@ def add_file(path: str, force: bool = False, db_path: Optional[str] = None) -> i
 
     ids = [f"{abs_path}::{i}" for i in range(len(chunks))]
 
-    add_documents(docs, metas, ids, content_hash=content_hash, db_path=db_path,
-                  documents_for_embed=docs_for_embed if desc_enabled else None)
+    return {
+        'docs': docs,
+        'metas': metas,
+        'ids': ids,
+        'content_hash': content_hash,
+        'docs_for_embed': docs_for_embed if desc_enabled else None,
+    }
 
-    return len(chunks)
+
+# Texts per embedding call when several files are embedded together; bounds
+# the padded (batch, seq_len) activations a single generate call allocates.
+_EMBED_BATCH_SIZE = int(os.getenv("CODE_RAG_EMBED_BATCH_SIZE", "64"))
+
+# Files read + chunked concurrently ahead of embedding (bounds open fds and
+# how many chunked-but-not-yet-embedded files are held in memory)
+_READ_CONCURRENCY = 16
+
+
+def embed_batched(texts: List[str]) -> List[List[float]]:
+    """embed_texts in slices of _EMBED_BATCH_SIZE, so MLX runs full batches
+    without one huge padded batch."""
+    embeddings = []
+    for start in range(0, len(texts), _EMBED_BATCH_SIZE):
+        embeddings.extend(embed_texts(texts[start:start + _EMBED_BATCH_SIZE]))
+    return embeddings
+
+
+def _add_chunked(chunked: Dict[str, object], db_path: Optional[str] = None) -> Dict[str, object]:
+    """Pre-delete, describe, embed and write files that are already chunked.
+
+    chunked maps path -> (content_hash, chunks) from _read_and_chunk, or the
+    exception it raised. Every chunk is embedded together (embed_batched)
+    instead of one small batch per file.
+    """
+    results, docs, metas, ids, texts = _collect_documents(chunked, db_path)
+    if docs:
+        _write_documents(docs, metas, ids, embed_batched(texts), db_path=db_path)
+    return results
+
+
+def _collect_documents(chunked: Dict[str, object], db_path: Optional[str] = None,
+                       predelete: bool = True):
+    """_build_documents for each chunked file, concatenated for one embed.
+
+    Returns (results, docs, metas, ids, texts); results maps path -> chunk
+    count or exception. With predelete=False the old chunks are left in
+    place; the caller must _replace_documents once the embeddings are in.
+    """
+    results: Dict[str, object] = {}
+    docs: List[str] = []
+    metas: List[Dict] = []
+    ids: List[str] = []
+    texts: List[str] = []
+
+    for path, read in chunked.items():
+        if isinstance(read, Exception):
+            results[path] = read
+            continue
+        try:
+            prepared = _build_documents(str(Path(path).absolute()), *read,
+                                        db_path=db_path, predelete=predelete)
+        except Exception as e:
+            results[path] = e
+            continue
+        if prepared is None:
+            results[path] = 0
+            continue
+        results[path] = len(prepared['docs'])
+        docs.extend(prepared['docs'])
+        content_hash = prepared['content_hash']
+        metas.extend({**m, 'content_hash': content_hash} if content_hash else m
+                     for m in prepared['metas'])
+        ids.extend(prepared['ids'])
+        texts.extend(prepared['docs_for_embed'] or prepared['docs'])
+
+    return results, docs, metas, ids, texts
+
+
+def _replace_documents(results: Dict[str, object], documents: List[str], metadatas: List[Dict],
+                       ids: List[str], embeddings: List[List[float]],
+                       db_path: Optional[str] = None):
+    """Pre-delete every file _collect_documents(predelete=False) built, then
+    write the new chunks. Must run as one step under the write lock, so no
+    other writer can index the same path in between."""
+    for path, count in results.items():
+        if not isinstance(count, Exception):
+            _predelete(str(Path(path).absolute()), db_path)
+    if documents:
+        _write_documents(documents, metadatas, ids, embeddings, db_path=db_path)
+
+
+def _scan_file(path: str, force: bool, db_path: Optional[str]):
+    """Worker-thread half of add_file for index_directory: hash check, then
+    read + chunk. Returns None for unchanged files."""
+    if not force and not file_needs_indexing(str(Path(path).absolute()), db_path):
+        return None
+    return _read_and_chunk(path, db_path)
+
+
+def _read_ahead(pool: ThreadPoolExecutor, fn, items: list, depth: int):
+    """Yield (item, future) in order with at most depth calls of fn in flight."""
+    pending = collections.deque()
+    it = iter(items)
+    for item in it:
+        pending.append((item, pool.submit(fn, item)))
+        if len(pending) >= depth:
+            break
+    while pending:
+        item, future = pending.popleft()
+        nxt = next(it, None)
+        if nxt is not None:
+            pending.append((nxt, pool.submit(fn, nxt)))
+        yield item, future
 
 
 def _get_indexed_paths_under(dir_path: str, db_path: Optional[str] = None) -> set:
@@ -792,14 +1016,13 @@ _DEFAULT_EXCLUDED_DIRS = {'node_modules', 'build', 'dist', 'target', 'bin',
                           'data', 'venv', 'cdk.out', 'generated'}
 
 
-def _load_ragignore(project_root: Optional[str] = None) -> Optional[set]:
-    """Load .ragignore from the project directory. Returns None if file doesn't exist."""
-    if project_root:
-        ragignore_path = Path(project_root) / '.ragignore'
-    else:
-        ragignore_path = Path(__file__).parent / '.ragignore'
-    if not ragignore_path.exists():
-        return None
+@functools.lru_cache(maxsize=32)
+def _load_ragignore(ragignore_path: str, mtime_ns: int) -> frozenset:
+    """Parse one version of a .ragignore. mtime_ns < 0 means the file doesn't
+    exist (defaults apply). Cached: a changed file has a new mtime, so it gets
+    a new key and is re-read."""
+    if mtime_ns < 0:
+        return frozenset(_DEFAULT_EXCLUDED_DIRS)
 
     excluded = set()
     with open(ragignore_path, 'r') as f:
@@ -807,24 +1030,45 @@ def _load_ragignore(project_root: Optional[str] = None) -> Optional[set]:
             line = line.strip()
             if line and not line.startswith('#'):
                 excluded.add(line)
-    return excluded
+    return frozenset(excluded)
 
 
-def get_excluded_dirs(extra_excludes: Optional[List[str]] = None, project_root: Optional[str] = None) -> set:
+def get_excluded_dirs(extra_excludes: Optional[List[str]] = None, project_root: Optional[str] = None) -> frozenset:
     """Get the set of excluded directory names.
-    Looks for .ragignore in project_root first, falls back to defaults."""
-    ragignore = _load_ragignore(project_root)
-    if ragignore is not None:
-        excluded = ragignore
+    Looks for .ragignore in project_root first, falls back to defaults.
+    Costs one stat per call once the file version has been parsed."""
+    if project_root:
+        ragignore_path = str(Path(project_root) / '.ragignore')
     else:
-        excluded = set(_DEFAULT_EXCLUDED_DIRS)
+        ragignore_path = str(Path(__file__).parent / '.ragignore')
+    try:
+        mtime_ns = os.stat(ragignore_path).st_mtime_ns
+    except OSError:
+        mtime_ns = -1
 
+    excluded = _load_ragignore(ragignore_path, mtime_ns)
     if extra_excludes:
-        excluded.update(extra_excludes)
+        excluded = excluded.union(extra_excludes)
 
     return excluded
 
 
+@functools.lru_cache(maxsize=32)
+def excluded_dirs_re(excluded_dirs: frozenset) -> Optional[re.Pattern]:
+    """Regex matching '/name/' for any name in a get_excluded_dirs() set, or
+    None if it is empty.
+
+    One search() per path instead of a set or substring test per name.
+    Cached per distinct set, so index_directory and the project's watcher
+    share one compiled pattern until .ragignore changes.
+    """
+    if not excluded_dirs:
+        return None
+    sep = re.escape(os.sep)
+    names = '|'.join(re.escape(d) for d in sorted(excluded_dirs))
+    return re.compile(f'{sep}(?:{names}){sep}')
+
+
 # --- Per-project .ragconfig ---
 
 _ragconfig_cache: Dict[str, dict] = {}
@@ -873,6 +1117,25 @@ def invalidate_ragconfig(project_root: str):
     _ragconfig_cache.pop(project_root, None)
 
 
+@functools.lru_cache(maxsize=32)
+def _compile_globs(patterns: Tuple[str, ...]) -> re.Pattern:
+    """Fold fnmatch patterns into one alternation (translate() anchors each)."""
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns))
+
+
+def get_exclude_pattern_re(project_root: Optional[str] = None) -> Optional[re.Pattern]:
+    """Compiled .ragconfig exclude_patterns, or None when there are none.
+
+    pattern.match(rel_path) is equivalent to any(fnmatch.fnmatch(rel_path, p))
+    over the list, as a single regex scan. Compiled once per distinct pattern
+    list, so a reloaded .ragconfig gets a fresh regex.
+    """
+    patterns = load_ragconfig(project_root).get('exclude_patterns') or []
+    if not patterns:
+        return None
+    return _compile_globs(tuple(str(p) for p in patterns))
+
+
 def index_directory(dir_path: str, extensions: Optional[List[str]] = None,
                     incremental: bool = True, progress_callback=None,
                     max_files: int = 0, extra_excludes: Optional[List[str]] = None,
@@ -884,10 +1147,10 @@ def index_directory(dir_path: str, extensions: Optional[List[str]] = None,
 
     # Derive project root from db_path ({root}/.code-rag/milvus.db) for .ragignore lookup
     project_root = str(Path(db_path).parent.parent) if db_path else None
-    excluded_dirs = get_excluded_dirs(extra_excludes, project_root=project_root)
+    excluded_dir_re = excluded_dirs_re(get_excluded_dirs(extra_excludes, project_root=project_root))
     ragconfig = load_ragconfig(project_root)
     ragconfig_exclude_ext = set(ragconfig.get('exclude_extensions', []))
-    ragconfig_exclude_patterns = ragconfig.get('exclude_patterns', [])
+    exclude_pattern_re = get_exclude_pattern_re(project_root)
 
     files_indexed = 0
     files_skipped = 0
@@ -896,32 +1159,35 @@ def index_directory(dir_path: str, extensions: Optional[List[str]] = None,
     by_language = {}
     by_type = {}
 
-    # Collect files
+    # Collect files: path-string filters first, then a single stat for the
+    # survivors (type + size), then the checks that touch the disk again
     all_files = []
     for file_path in dir_path.rglob('*'):
-        if not file_path.is_file():
-            continue
         if file_path.suffix not in extensions:
             continue
         if any(part.startswith('.') for part in file_path.relative_to(dir_path).parts[:-1]):
             continue
-        if excluded_dirs & set(file_path.parts):
+        # Wrapped in separators so every component, first and last included,
+        # is tested (same as intersecting with file_path.parts)
+        if excluded_dir_re and excluded_dir_re.search(f'{os.sep}{file_path}{os.sep}'):
             continue
         if file_path.suffix in ragconfig_exclude_ext:
             continue
-        if ragconfig_exclude_patterns:
-            rel = str(file_path.relative_to(dir_path))
-            if any(fnmatch.fnmatch(rel, pat) for pat in ragconfig_exclude_patterns):
-                continue
-        if file_path.suffix in ('.js', '.jsx'):
-            if file_path.with_suffix('.ts').exists() or file_path.with_suffix('.tsx').exists():
-                continue
-        if file_path.name.endswith('.d.ts'):
+        if exclude_pattern_re and exclude_pattern_re.match(str(file_path.relative_to(dir_path))):
             continue
-        if file_path.stat().st_size > 1024 * 1024:
+        if file_path.name.endswith('.d.ts'):
             continue
         if file_path.name.startswith('.'):
             continue
+        try:
+            st = file_path.stat()
+        except OSError:
+            continue
+        if not stat.S_ISREG(st.st_mode) or st.st_size > 1024 * 1024:
+            continue
+        if file_path.suffix in ('.js', '.jsx'):
+            if file_path.with_suffix('.ts').exists() or file_path.with_suffix('.tsx').exists():
+                continue
         if jaxb_filter and file_path.suffix == '.java' and is_jaxb_generated(str(file_path)):
             continue
         all_files.append(file_path)
@@ -943,30 +1209,39 @@ def index_directory(dir_path: str, extensions: Optional[List[str]] = None,
             if stale_paths:
                 print(f"  Removed {len(stale_paths)} stale file(s) from index")
 
-        for idx, file_path in enumerate(all_files):
-            try:
-                num_chunks = add_file(str(file_path), force=not incremental, db_path=db_path)
-                if num_chunks > 0:
-                    files_indexed += 1
-                    chunks_created += num_chunks
-
-                    lang = chunking.detect_language(str(file_path))
-                    t = chunking.detect_type(str(file_path), lang)
-                    by_language[lang] = by_language.get(lang, 0) + num_chunks
-                    by_type[t] = by_type.get(t, 0) + num_chunks
-
-                    if files_indexed % 10 == 0:
-                        with GPU:
-                            mx.clear_cache()
-                else:
-                    files_skipped += 1
-
-            except Exception as e:
-                print(f"Error indexing {file_path}: {e}")
-                errors += 1
-
-            if progress_callback:
-                progress_callback(idx + 1, total_files, file_path.name)
+        # Hash checks, reads and chunking run ahead on a thread pool; this
+        # thread only describes, embeds and writes, in file order
+        force = not incremental
+        pool = ThreadPoolExecutor(max_workers=_READ_CONCURRENCY)
+        scans = _read_ahead(pool, lambda p: _scan_file(str(p), force, db_path),
+                            all_files, depth=2 * _READ_CONCURRENCY)
+        try:
+            for idx, (file_path, scan) in enumerate(scans):
+                try:
+                    read = scan.result()
+                    num_chunks = 0
+                    if read is not None:
+                        prepared = _build_documents(str(file_path.absolute()), *read, db_path=db_path)
+                        num_chunks = _add_prepared(prepared, db_path)
+                    if num_chunks > 0:
+                        files_indexed += 1
+                        chunks_created += num_chunks
+
+                        lang = chunking.detect_language(str(file_path))
+                        t = chunking.detect_type(str(file_path), lang)
+                        by_language[lang] = by_language.get(lang, 0) + num_chunks
+                        by_type[t] = by_type.get(t, 0) + num_chunks
+                    else:
+                        files_skipped += 1
+
+                except Exception as e:
+                    print(f"Error indexing {file_path}: {e}")
+                    errors += 1
+
+                if progress_callback:
+                    progress_callback(idx + 1, total_files, file_path.name)
+        finally:
+            pool.shutdown(cancel_futures=True)
 
     # Free description model memory after batch indexing
     if nl_descriptions.is_enabled(db_path=db_path):
@@ -1022,6 +1297,85 @@ async def add_file_async(path: str, force: bool = False, db_path: Optional[str]
             lambda: add_file(path, force=force, db_path=db_path))
 
 
+async def embed_batched_async(texts: List[str]) -> List[List[float]]:
+    """embed_batched on the default executor, under the embed semaphore."""
+    loop = asyncio.get_event_loop()
+    if _embed_semaphore is not None:
+        async with _embed_semaphore:
+            return await loop.run_in_executor(None, embed_batched, texts)
+    return await loop.run_in_executor(None, embed_batched, texts)
+
+
+async def add_files_batch_async(paths: List[str], db_path: Optional[str] = None,
+                                force: bool = False,
+                                embed: Optional[Callable] = None) -> Dict[str, object]:
+    """Add several files for the file watcher: one embed + write for the batch.
+
+    Unchanged files are filtered out lock-free first (as in add_file_async),
+    then the rest are read and chunked concurrently on the default executor,
+    also lock-free. Only the pre-delete, descriptions, embedding and write
+    run under the embed semaphore and write lock. Returns {path: chunk count
+    or exception}.
+
+    embed, if given, replaces the built-in embedding step (the watcher
+    passes its cross-project worker). Descriptions still run under the
+    semaphore and lock, but both are released while embed runs, so other projects can queue their own texts alongside. The old
+    chunks stay searchable until the embeddings are back; the pre-delete and
+    write then happen together under the lock, and if embed fails the index
+    is left untouched.
+    """
+    loop = asyncio.get_event_loop()
+
+    if force:
+        pending = list(paths)
+    else:
+        needs = await loop.run_in_executor(None,
+            lambda: [file_needs_indexing(str(Path(p).absolute()), db_path) for p in paths])
+        pending = [p for p, n in zip(paths, needs) if n]
+    results: Dict[str, object] = {p: 0 for p in paths}
+    if not pending:
+        return results
+
+    read_slots = asyncio.Semaphore(_READ_CONCURRENCY)
+
+    async def read(path):
+        async with read_slots:
+            return await loop.run_in_executor(None, _read_and_chunk, path, db_path)
+
+    reads = await asyncio.gather(*(read(p) for p in pending), return_exceptions=True)
+    chunked = dict(zip(pending, reads))
+
+    if embed is not None:
+        async def locked(fn):
+            if _write_lock is not None:
+                async with _write_lock:
+                    return await loop.run_in_executor(None, fn)
+            return await loop.run_in_executor(None, fn)
+
+        # NL descriptions run an MLX model, so building the documents also
+        # takes the embed semaphore, like the single-pass path below; it is
+        # released before embed(), which takes it itself
+        collect = lambda: _collect_documents(chunked, db_path, predelete=False)
+        if _embed_semaphore is not None:
+            async with _embed_semaphore:
+                collected, docs, metas, ids, texts = await locked(collect)
+        else:
+            collected, docs, metas, ids, texts = await locked(collect)
+        embeddings = await embed(texts) if docs else []
+        await locked(lambda: _replace_documents(collected, docs, metas, ids, embeddings, db_path))
+        results.update(collected)
+        return results
+
+    run = lambda: _add_chunked(chunked, db_path)
+    if _embed_semaphore is not None and _write_lock is not None:
+        async with _embed_semaphore:
+            async with _write_lock:
+                results.update(await loop.run_in_executor(None, run))
+    else:
+        results.update(await loop.run_in_executor(None, run))
+    return results
+
+
 async def delete_by_path_async(file_path: str, db_path: Optional[str] = None) -> int:
     """Async delete_by_path for use by file watcher. Uses write lock."""
     loop = asyncio.get_event_loop()
@@ -103,9 +103,11 @@ pip install --quiet "tree-sitter>=0.25.0" "tree-sitter-java>=0.23.0" "tree-sitte
 
 echo "  Installing watchdog (file watcher)..."
 pip install --quiet "watchdog>=4.0.0"
+pip install --quiet pyobjc-framework-FSEvents pyobjc-framework-libdispatch || echo "  pyobjc FSEvents install failed (optional, watchdog is used instead)"
 
 echo "  Installing MCP (optional - for Claude Code integration)..."
 pip install --quiet mcp || echo "  MCP install failed (optional, can skip)"
+pip install --quiet uvloop httptools || echo "  uvloop/httptools install failed (optional, asyncio/h11 are used instead)"
 
 echo "  All dependencies installed"
 